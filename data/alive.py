@@ -21,7 +21,7 @@ import aliveController
 def run():
     # switch to this path to point relative paths to resources
     os.chdir(os.path.dirname(os.path.realpath(__file__)))
-    evManager = eventmanager.EventManager()
+    evManager = eventmanager.EventManager(queued=True)
     gamemodel = aliveModel.GameEngine(evManager)
     graphics = aliveView.GraphicalView(evManager, gamemodel)
     kbmousey = aliveController.KeyboardMouse(evManager, gamemodel, graphics)
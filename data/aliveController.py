@@ -24,63 +24,62 @@ class KeyboardMouse(object):
 
     def __init__(self, evManager, model, view):
         self.evManager = evManager
-        evManager.RegisterListener(self)
+        evManager.RegisterListener(self, {TickEvent: self.on_tick})
         self.model = model
         self.view = view
 
-    def notify(self, event):
+    def on_tick(self, event):
         """
-        Called by an event in the message queue.
+        Handle any pending input, called on each TickEvent.
         """
 
         try:
-            if isinstance(event, TickEvent):
-                for event in pygame.event.get():
-                    # always handle window closing events
-                    if event.type == pygame.QUIT:
-                        self.evManager.Post(QuitEvent())
-
-                    # all key downs
-                    if event.type == pygame.KEYDOWN:
-                        state = self.model.state.peek()
-
-                        if state == STATE_INTRO:
-                            self.intro_keys(event)
-
-                        elif state in (STATE_MENU_MAIN,
-                                        STATE_MENU_SAVED,
-                                        STATE_MENU_STORIES,
-                                        STATE_MENU_OPTIONS):
-                            self.menu_keys(event)
-
-                        elif state == STATE_PLAY:
-                            self.play_keys(event)
-
-                        elif state == STATE_LEVEL_FAIL:
-                            self.level_failed_keys(event)
-
-                        elif state == STATE_DIALOG:
-                            self.dialogue_keys(event)
-
-                        elif state == STATE_CRASH:
-                            self.crash_keys(event)
-
-                        elif state == STATE_HELP:
-                            self.help_keys(event)
-
-                        elif state in (
-                                        STATE_INFO_HOME,
-                                        STATE_INFO_UPGRADES,
-                                        STATE_INFO_WINS
-                                        ):
-                            self.info_keys(event)
-
-                        else:
-                            # allow escaping from unhandled states
-                            self.evManager.Post(StateChangeEvent(None))
-                    elif event.type == pygame.KEYUP:
-                            self.evManager.Post(
-                                InputEvent(char=None, clickpos=None))
+            for event in pygame.event.get():
+                # always handle window closing events
+                if event.type == pygame.QUIT:
+                    self.evManager.Post(QuitEvent())
+
+                # all key downs
+                if event.type == pygame.KEYDOWN:
+                    state = self.model.state.peek()
+
+                    if state == STATE_INTRO:
+                        self.intro_keys(event)
+
+                    elif state in (STATE_MENU_MAIN,
+                                    STATE_MENU_SAVED,
+                                    STATE_MENU_STORIES,
+                                    STATE_MENU_OPTIONS):
+                        self.menu_keys(event)
+
+                    elif state == STATE_PLAY:
+                        self.play_keys(event)
+
+                    elif state == STATE_LEVEL_FAIL:
+                        self.level_failed_keys(event)
+
+                    elif state == STATE_DIALOG:
+                        self.dialogue_keys(event)
+
+                    elif state == STATE_CRASH:
+                        self.crash_keys(event)
+
+                    elif state == STATE_HELP:
+                        self.help_keys(event)
+
+                    elif state in (
+                                    STATE_INFO_HOME,
+                                    STATE_INFO_UPGRADES,
+                                    STATE_INFO_WINS
+                                    ):
+                        self.info_keys(event)
+
+                    else:
+                        # allow escaping from unhandled states
+                        self.evManager.Post(StateChangeEvent(None))
+                elif event.type == pygame.KEYUP:
+                        self.evManager.Post(
+                            InputEvent(char=None, clickpos=None))
         except:
             self.evManager.Post(CrashEvent())
 
@@ -116,6 +115,7 @@ class KeyboardMouse(object):
                     pygame.K_F5: 'reveal map',
                     pygame.K_F6: 'heal all',
                     pygame.K_F7: 'demo map',
+                    pygame.K_F8: 'event stats',
                     }
         if event.key == pygame.K_ESCAPE:
             self.evManager.Post(StateChangeEvent(None))
@@ -129,13 +129,15 @@ class KeyboardMouse(object):
             if event.key in debug_keys.keys():
                 self.evManager.Post(DebugEvent(debug_keys[event.key]))
             elif event.key == pygame.K_F1:
-                trace.write('Debug commands')
-                trace.write('^F2=render tile + animation cheatsheets')
-                trace.write('^F3=restart the current level')
-                trace.write('^F4=warp to the next level')
-                trace.write('^F5=reveal the map')
-                trace.write('^F6=heal health, power, and give 10 free upgrades')
-                trace.write('^F7=warp to map building demo')
+                trace.info('debug', 'Debug commands')
+                trace.info('debug', '^F2=render tile + animation cheatsheets')
+                trace.info('debug', '^F3=restart the current level')
+                trace.info('debug', '^F4=warp to the next level')
+                trace.info('debug', '^F5=reveal the map')
+                trace.info('debug',
+                    '^F6=heal health, power, and give 10 free upgrades')
+                trace.info('debug', '^F7=warp to map building demo')
+                trace.info('debug', '^F8=record or dump event stats')
         elif event.key == pygame.K_F1:
             self.evManager.Post(StateChangeEvent(STATE_HELP))
         else:
@@ -20,6 +20,7 @@ import random
 import pickle
 import traceback
 import datetime
+import numpy
 from const import *
 import color
 import trace
@@ -48,20 +49,26 @@ class GameEngine(object):
 
     engine_pumping (bool)
         True while the engine is pumping out TickEvents to all
-        listeners. Gets changed if we see a notify() QuitEvent.
+        listeners. Gets changed if we hear a QuitEvent.
 
     state (StateMachine)
         Stores the current game state, like which menu we are in,
         if we are busy playing, or viewing word dialogues,
         or the info screens.
 
-    event_queue (dict)
-        A queue of delayed events to post at a later time.
-        The value is the seconds to delay before posting.
+    frame_timer (Scheduler)
+        Delayed events to post after a number of frames.
 
     settings (Settings)
         An instance of Settings class.
 
+    seed (int)
+        The seed the current game started with.
+
+    random (Random)
+        The random number generator for all game rules, seeded per game
+        and saved with it so that games can be replayed.
+
     game_in_progress (bool)
         True if there is a game in progress. This mainly escapes
         game-only calls to ensure the user can't do much if there
@@ -123,11 +130,22 @@ class GameEngine(object):
         """
 
         self.evManager = evManager
-        evManager.RegisterListener(self)
+        evManager.RegisterListener(self, {
+            QuitEvent: self.on_quit,
+            StateChangeEvent: self.on_state_change,
+            StateSwapEvent: self.on_state_swap,
+            PlayerMoveRequestEvent: self.on_move_request,
+            CombatEvent: self.on_combat,
+            KillCharacterEvent: self.on_kill_character,
+            DebugEvent: self.debug_action,
+            CrashEvent: self.on_crash,
+            })
         self.engine_pumping = True
         self.state = StateMachine()
-        self.event_queue = {}
+        self.frame_timer = rlhelper.Scheduler()
         self.settings = Settings()
+        self.seed = None
+        self.random = random.Random()
         self.game_in_progress = False
         self.level = None
         self.level_number = 0
@@ -144,49 +162,73 @@ class GameEngine(object):
         self.game_slot = 0
         self.story_name = 'ascension'
 
-    def notify(self, event):
+    def on_quit(self, event):
         """
-        Called by an event in the message queue.
+        Stop the engine loop and save the game.
         """
 
-        if isinstance(event, QuitEvent):
-            self.engine_pumping = False
-            self.save_game()
+        self.engine_pumping = False
+        self.save_game()
+        if self.evManager.stats:
+            self.evManager.stats.dump(EVENT_STATS_FILE)
 
-        elif isinstance(event, StateChangeEvent):
-            self.change_state(event.state)
+    def on_state_change(self, event):
+        """
+        Change to the event state.
+        """
 
-        elif isinstance(event, StateSwapEvent):
-            self.state.swap(event.state)
+        self.change_state(event.state)
 
-        elif isinstance(event, PlayerMoveRequestEvent):
-            self.last_direction = event.direction
-            self.move_player(event.direction)
+    def on_state_swap(self, event):
+        """
+        Swap the current state with the event state.
+        """
 
-        elif isinstance(event, CombatEvent):
-            self.combat_turn(event.attacker, event.defender)
+        self.state.swap(event.state)
 
-        elif isinstance(event, KillCharacterEvent):
-            if event.character in self.objects:
-                self.objects.remove(event.character)
-                self.update_block_matrix(
-                    event.character.x, event.character.y, 0)
+    def on_move_request(self, event):
+        """
+        Move the player in the requested direction.
+        """
+
+        self.last_direction = event.direction
+        self.move_player(event.direction)
 
-        elif isinstance(event, DebugEvent):
-            self.debug_action(event)
+    def on_combat(self, event):
+        """
+        Resolve a round of combat between two characters.
+        """
 
-        elif isinstance(event, CrashEvent):
-            self.change_state(STATE_CRASH)
-            error_message = str(traceback.format_exc())
-            print(error_message)
-            trace.log_crash(error_message)
+        self.combat_turn(event.attacker, event.defender)
+
+    def on_kill_character(self, event):
+        """
+        Remove a dead character from the level.
+        """
+
+        if event.character in self.objects:
+            self.objects.remove(event.character)
+            self.level.object_grid.remove(event.character)
+            self.level.actor_schedule.remove(event.character)
+            self.update_block_matrix(
+                event.character.x, event.character.y, 0)
+
+    def on_crash(self, event):
+        """
+        Switch to the crash state and log the error we are handling.
+        """
+
+        self.change_state(STATE_CRASH)
+        error_message = str(traceback.format_exc())
+        print(error_message)
+        trace.log_crash(error_message)
 
     def run(self):
         """
         Starts the game engine loop.
 
         This pumps a Tick event into the message queue for each loop.
-        The loop ends when this object hears a QuitEvent in notify().
+        The loop ends when this object hears a QuitEvent in on_quit().
         """
 
         self.post(InitializeEvent())
@@ -198,20 +240,25 @@ class GameEngine(object):
             self.evManager.Post(newTick)
 
             # process any delayed events
-            for event, delay in self.event_queue.items():
-                delay -= 1
-                if delay < 1:
-                    del self.event_queue[event]
-                    self.post(event)
-                else:
-                    self.event_queue[event] = delay
+            for event in self.frame_timer.advance():
+                self.post(event)
+
+            # deliver what this tick posted, if our events are queued,
+            # unless it quit the game and shut down the display.
+            if self.engine_pumping:
+                self.evManager.Pump()
 
-    def begin_game(self):
+    def begin_game(self, seed=None):
         """
         Begins a new game.
         event.story contains the campaign to play.
+        seed replays the game of that seed, if given.
         """
 
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.random.seed(seed)
         self.turn = 0
         self.level = None
         self.level_number = 0
@@ -246,7 +293,7 @@ class GameEngine(object):
         base_path = os.path.dirname(os.path.abspath(__file__))
         full_path = os.path.join(base_path, 'stories', storyname, 'story.conf')
         self.story = story.StoryData(full_path)
-        trace.write('loaded story OK')
+        trace.info('story', 'loaded story OK')
         return True
 
     def restart_level(self):
@@ -257,11 +304,12 @@ class GameEngine(object):
         """
 
         self.player = copy.deepcopy(self.store['player copy'])
-        self.warp_level(restart=True)
+        self.warp_level(restart=True, level_filename=self.level.filename)
 
-    def warp_level(self, restart=False):
+    def warp_level(self, restart=False, level_filename=None):
         """
         Proceed to the next level.
+        level_filename loads that map in place of the story's next level.
         """
 
         if not restart and not self.can_warp:
@@ -269,16 +317,17 @@ class GameEngine(object):
         if not restart:
             self.level_number += 1
 
-        trace.write('warping to level: %s ' % self.level_number)
-        level_filename = self.story.level_file(self.level_number)
+        trace.info('level', 'warping to level: %s ', self.level_number)
+        if not level_filename:
+            level_filename = self.story.level_file(self.level_number)
         if not level_filename or not os.path.exists(level_filename):
-            trace.write('Warning! There is no map for level %s. '
-                        'I guess I am stuck here.' % self.level_number)
+            trace.warning('level', 'Warning! There is no map for level %s. '
+                        'I guess I am stuck here.', self.level_number)
             return False
         self.can_warp = False
         self.store = {}
         self.trigger_queue = []
-        self.event_queue = {}
+        self.frame_timer.clear()
         self.level = GameLevel(level_filename)
         self.load_objects()
         self.load_matrix()
@@ -325,15 +374,16 @@ class GameEngine(object):
         """
 
         matrix = self.level.matrix['block']
-        # for each level cell
-        for y in range(0, self.level.tmx.height):
-            for x in range(0, self.level.tmx.width):
-                # and for every map tile layer
-                for layer in self.level.tmx.tilelayers:
-                    # this tile blocks movement
-                    gid = layer.at((x, y))
-                    if self.story.tile_blocks(gid):
-                        matrix[x][y] = 1
+        # look up which tiles block for every map tile layer at once.
+        # gids outside the story blocking table do not block.
+        table = numpy.frombuffer(self.story.blocking_table, dtype=numpy.uint8)
+        gids = self.level.tmx.tile_gids()
+        known = (gids >= 0) & (gids < len(table))
+        blocks = numpy.zeros(gids.shape, dtype=bool)
+        blocks[known] = table[gids[known]]
+        # a tile blocks if it does on any layer. layers index as [y, x]
+        # so we flip them to match our matrix.
+        matrix[blocks.any(axis=0).T] = 1
         # also include all blocking objects
         for objectgroup in self.level.tmx.objectgroups:
             for obj in objectgroup:
@@ -366,6 +416,7 @@ class GameEngine(object):
                      'freeze_duration': 0,
                      'confused_duration': 0,
                      'last_direction': None,
+                     'activation_radius': 0,
                      }
 
         # for each object group on this level (because maps can be layers)
@@ -391,7 +442,8 @@ class GameEngine(object):
                 # apply character stats from the story config
                 stats = self.story.char_stats(obj.name)
                 if stats:
-                    trace.write('applying conf stats for %s' % (obj.name,))
+                    trace.debug('level',
+                        'applying conf stats for %s', obj.name)
                     obj.attack = stats.as_float('attack')
                     obj.health = stats.as_float('health')
                     obj.max_health = stats.as_float('max_health')
@@ -403,6 +455,9 @@ class GameEngine(object):
                     obj.power_restore_rate = (
                         stats.as_float('power_restore_rate'))
                     obj.modes = stats.as_list('modes')
+                    if 'activation_radius' in stats:
+                        obj.activation_radius = (
+                            stats.as_float('activation_radius'))
 
                 # carry the player object across levels
                 if obj.type == 'player':
@@ -432,6 +487,8 @@ class GameEngine(object):
 
                 # add this one to the collective
                 self.objects.append(obj)
+                self.level.object_grid.add(obj)
+                self.schedule_actor(obj)
 
         # show a courtesy message
         if self.player is None:
@@ -445,7 +502,7 @@ class GameEngine(object):
 
         """
 
-        trace.write('TURN %s' % self.turn)
+        trace.debug('turn', 'TURN %s', self.turn)
         if self.player.dead:
             return
         self.move_character(self.player, direction)
@@ -529,18 +586,18 @@ class GameEngine(object):
         # unfreeze a little.
         if character.freeze_duration > 0:
             character.freeze_duration -= 1
-            trace.write('%s is frozen for %s turns' %
-                (character.name, character.freeze_duration))
+            trace.debug('ai', '%s is frozen for %s turns',
+                character.name, character.freeze_duration)
             # a small chance that a code freeze is deadly
-            if random.randint(1, 100) < 10:
+            if self.random.randint(1, 100) < 10:
                 self.kill_character(character)
             return False
 
         # reduce any confusion. note its effect is handled in ai_movement_turn.
         if character.confused_duration > 0:
             character.confused_duration -= 1
-            trace.write('%s is confused for %s turns' %
-                (character.name, character.confused_duration))
+            trace.debug('ai', '%s is confused for %s turns',
+                character.name, character.confused_duration)
 
         # boundary check
         if not self.location_inside_map(x, y):
@@ -580,6 +637,7 @@ class GameEngine(object):
         character.x, character.y = (x, y)
         character.px, character.py = (x * self.level.tmx.tile_width,
                                       y * self.level.tmx.tile_height)
+        self.level.object_grid.update(character)
 
         # set the block matrix with the new position
         tile_blocks = self.story.tile_blocks(character.gid)
@@ -627,12 +685,32 @@ class GameEngine(object):
         Moves all the ai characters.
         """
 
-        for obj in [e for e in self.objects
+        schedule = self.level.actor_schedule
+        px, py = self.player.getxy()
+
+        # wake sleeping characters the player came near to, or can see
+        if schedule.sleeping:
+            for obj in schedule.sleeping_near(px, py, self.level.wake_radius):
+                if (rlhelper.distance(px, py, obj.x, obj.y) <=
+                        obj.activation_radius):
+                    self.wake_actor(obj, self.turn)
+            for obj in self.level.objects_in_range:
+                self.wake_actor(obj, self.turn)
+
+        # the schedule only gives us characters whose speed lets them
+        # act on this turn.
+        for obj in [e for e in schedule.acting(self.turn)
                             if e.type in ('ai', 'friend') and
                             not e.dead and
-                            (e.speed > 0) and
-                            (int(self.turn % e.speed) == 0) and
                             e is not self.player]:
+            # characters out of sight and beyond their activation radius
+            # of the player go to sleep.
+            if (obj.activation_radius > 0 and not obj.in_range and
+                    rlhelper.distance(px, py, obj.x, obj.y) >
+                    obj.activation_radius):
+                trace.debug('ai', '%s falls asleep', obj.name)
+                schedule.sleep(obj, self.turn)
+                continue
             # NOTE: x,y is misleading - its the direction, not absolute points.
             x, y = (0, 0)
             for mode in obj.modes:
@@ -679,9 +757,9 @@ class GameEngine(object):
                             x, y = rlhelper.direction(
                                 obj.x, obj.y, *trail[idx])
                 if mode == 'random' or obj.confused_duration > 0:
-                    if random.randint(0, 1):
-                        x = random.randint(-1, 1)
-                        y = random.randint(-1, 1)
+                    if self.random.randint(0, 1):
+                        x = self.random.randint(-1, 1)
+                        y = self.random.randint(-1, 1)
             # normalize positions then move
             x = (x < -1) and -1 or x
             x = (x > 1) and 1 or x
@@ -704,57 +782,46 @@ class GameEngine(object):
         Marks any other objects within the player characters range as seen.
         """
 
-        RANGE = int(round(self.player.view_range))
         px, py = (self.player.x, self.player.y)
         # store the level seen matrix
         seen_mx = self.level.matrix['seen']
         # store the level blocked matrix
         blocked_mx = self.level.matrix['block']
-        # store the map width and height
-        w, h = (len(seen_mx), len(seen_mx[0]))
-
-        # reset any in-view tiles as "seen"
-        for y in range(0, h):
-            for x in range(0, w):
-                # set to 1 (seen) if it is 2 (in view)
-                seen_mx[x][y] = seen_mx[x][y] == 2 and 1 or seen_mx[x][y]
-                # same for objects who were in range
-                # FIXME optimize by just iterating over the whole list once?
-                #       consider this call does that now for each x, y :p
-                objects = self.get_object_by_xy(x, y)
-                for obj in objects:
-                    obj.in_range = False
-
-        ## DEBUG printout the blocked matrix
-        #for v in range(0, h):
-            #for u in range(0, w):
-                #print(blocked_mx[u][v]),
-            #print()
-
-        for x, y in rlhelper.cover_area(px, py,
-                                        self.player.view_range, w - 1, h - 1):
-
-            # test if we also have line of sight to this position
-            # FIXME the get line segments gives an inconsistent effect:
-            #       positions to our left use points asymetrical to the right
-            #       resulting in the block matrix checking cells with twisted
-            #       positions. bottom-right corners appear out of sight
-            #       when the top-left counterparts are in view.
-            #       This can be seen by uncommenting the DEBUG print loop
-            #       above and comparing the top and bottom line segments
-            #       that are checked against the blocked matrix.
-            #       -- see print in line_of_sight() too.
-            if (rlhelper.line_of_sight(blocked_mx, px, py, x, y)):
-
-                # mark this matrix tile as in view
-                seen_mx[x][y] = 2
-
-                # and any objects too
-                objects = self.get_object_by_xy(x, y)
-                for obj in objects:
-                    # mark object is in_range
-                    obj.in_range = True
-                    obj.seen = True
+
+        # cast our field of view over the blocked matrix
+        visible = rlhelper.field_of_view(
+            blocked_mx, px, py, self.player.view_range)
+
+        # only tiles that left our view are reset to "seen" (1).
+        # this keeps the cost of a turn down to the size of our view,
+        # instead of the size of the map.
+        left_view = self.level.visible_tiles - visible
+        if left_view:
+            seen_mx[tuple(zip(*left_view))] = 1
+
+        # note which tiles entered or left our view, for the fog overlay
+        self.level.fog_changes.update(left_view)
+        self.level.fog_changes.update(visible - self.level.visible_tiles)
+
+        # mark these matrix tiles as in view (2)
+        seen_mx[tuple(zip(*visible))] = 2
+
+        # and any objects too
+        in_range = set()
+        for x, y in visible:
+            in_range.update(self.get_object_by_xy(x, y))
+
+        # same for objects who were in range
+        for obj in self.level.objects_in_range - in_range:
+            obj.in_range = False
+
+        for obj in in_range:
+            # mark object is in_range
+            obj.in_range = True
+            obj.seen = True
+
+        self.level.visible_tiles = visible
+        self.level.objects_in_range = in_range
 
     def seen_tile(self, x, y):
         """
@@ -782,12 +849,7 @@ class GameEngine(object):
         Get a list of characters at x, y.
         """
 
-        return [o for o in self.objects
-            if x >= o.x and
-            y >= o.y and
-            x < o.x + o.width and
-            y < o.y + o.height
-            ]
+        return self.level.object_grid.at(x, y)
 
     def get_object_by_name(self, name):
         """
@@ -804,11 +866,8 @@ class GameEngine(object):
 
         # fix: account for reaching to diagonals:
         reach += 0.5
-        the_list = []
         w, h = self.level.tmx.width, self.level.tmx.height
-        [the_list.extend(self.get_object_by_xy(u, v))
-            for u, v in rlhelper.cover_area(x, y, reach, w, h)
-            ]
+        the_list = self.level.object_grid.in_radius(x, y, reach, w, h)
         return [o for o in the_list if o.type in type_filter]
 
     def heal_turn(self):
@@ -816,22 +875,66 @@ class GameEngine(object):
         Each turn characters gets a chance to heal.
         """
 
-        for npc in [e for e in self.objects
+        for npc in [e for e in self.level.actor_schedule
                             if e.type in ('player', 'ai', 'friend')
                             and not e.dead]:
             # health
             if npc.health < npc.max_health:
                 if (npc.heal_rate > 0):
                     self.adjust_character_health(npc, npc.heal_rate)
-                    trace.write('%s heals to %s hp' %
-                        (npc.name, npc.health))
+                    trace.debug('ai', '%s heals to %s hp',
+                        npc.name, npc.health)
             # mana
             if npc.power < npc.max_power:
                 if npc.power_restore_rate > 0:
                     npc.power = rlhelper.clamp(
                         npc.power + npc.power_restore_rate, 0, npc.max_power)
-                    trace.write('%s heals power to %s hp' %
-                        (npc.name, npc.power))
+                    trace.debug('ai', '%s heals power to %s hp',
+                        npc.name, npc.power)
+
+    def schedule_actor(self, obj):
+        """
+        Add a character to the level's actor schedule, or rebucket it
+        after its speed changed. Other objects are ignored.
+
+        """
+
+        if obj.type in ('player', 'ai', 'friend'):
+            # the next movement turn is after the one we are on
+            self.wake_actor(obj)
+            self.level.actor_schedule.add(obj, self.turn + 1)
+            self.level.wake_radius = max(
+                self.level.wake_radius, obj.activation_radius)
+
+    def wake_actor(self, obj, turn=None):
+        """
+        Wake a sleeping character, acting from turn on, or else from the
+        next turn. Does nothing if it is awake.
+
+        It catches up on the turns it slept: it heals and restores power
+        for each of them, and its freeze and confusion wear off by the
+        moves it missed. It does not catch up on those moves, it carries
+        on from where it fell asleep.
+
+        """
+
+        schedule = self.level.actor_schedule
+        if not schedule.is_asleep(obj):
+            return
+        if turn is None:
+            turn = self.turn + 1
+        slept = schedule.wake(obj, turn)
+        if not slept:
+            return
+        trace.debug('ai', '%s wakes after %s turns', obj.name, slept)
+        if obj.health < obj.max_health and obj.heal_rate > 0:
+            self.adjust_character_health(obj, obj.heal_rate * slept)
+        if obj.power < obj.max_power and obj.power_restore_rate > 0:
+            obj.power = rlhelper.clamp(
+                obj.power + obj.power_restore_rate * slept, 0, obj.max_power)
+        moves = int(slept / max(obj.speed, 1))
+        obj.freeze_duration = max(0, obj.freeze_duration - moves)
+        obj.confused_duration = max(0, obj.confused_duration - moves)
 
     def split_value_pairs(self, string_value):
         """
@@ -871,8 +974,10 @@ class GameEngine(object):
 
         """
 
-        trace.write(('interact with "%s"%s' %
-                    (obj.name, (direct) and (' directly') or (' indirctly'))))
+        trace.debug('trigger', 'interact with "%s"%s',
+                    obj.name, (direct) and (' directly') or (' indirctly'))
+        # sleeping characters wake to their triggers
+        self.wake_actor(obj)
         for key in obj.properties.keys():
             prop = obj.properties[key]
             if type(prop) is str:
@@ -906,7 +1011,8 @@ class GameEngine(object):
                         self.trigger_queue.append(command_data)
                     else:
                         self.trigger_queue.insert(0, command_data)
-                    trace.write('\t"%s" added to trigger queue' % key)
+                    trace.debug('trigger',
+                        '\t"%s" added to trigger queue', key)
 
     def random_identifier(self, prefix=''):
         """
@@ -916,7 +1022,7 @@ class GameEngine(object):
 
         """
 
-        return '%s_%x' % (prefix, random.randint(0, 1000))
+        return '%s_%x' % (prefix, self.random.randint(0, 1000))
 
     def process_interaction_queue(self):
         """
@@ -935,15 +1041,15 @@ class GameEngine(object):
         while self.trigger_queue:
             trig = self.trigger_queue.pop()
             name = trig['name']
-            trace.write('processing the "%s" trigger' % name)
+            trace.debug('trigger', 'processing the "%s" trigger', name)
             direct = trig['direct']
             obj = trig['obj']
             commands = trig['commands']
             user_data = trig['user_data']
             delay = trig['delay']
             if delay > 0:
-                trace.write('\t"%s" trigger delayed %s turn(s)' %
-                    (name, delay))
+                trace.debug('trigger', '\t"%s" trigger delayed %s turn(s)',
+                    name, delay)
                 trig['delay'] = delay - 1
                 requeue.append(trig)
             else:
@@ -952,34 +1058,37 @@ class GameEngine(object):
                 ifcounter = self.split_command(commands, '@ifcounter', None)
                 counter_value = obj.properties.get('counter', 0)
                 if ifcounter and int(ifcounter) != int(counter_value):
-                    trace.write('\tcounter "%s" on "%s" != expected "%s"' %
-                        (counter_value, obj.name, ifcounter))
+                    trace.debug('trigger',
+                        '\tcounter "%s" on "%s" != expected "%s"',
+                        counter_value, obj.name, ifcounter)
                     continue
                     # NOTE: side effects from continue?
                 if '@trigger' in commands and direct:
                     _object_list = self.get_object_by_name(user_data)
                     for _trig_object in _object_list:
-                        trace.write('\t"%s" triggers "%s"' %
-                            (obj.name, _trig_object.name))
+                        trace.debug('trigger', '\t"%s" triggers "%s"',
+                            obj.name, _trig_object.name)
                         self.trigger_object(_trig_object, False)
                 if '@exit' in commands:
                     #self.warp_level()
-                    trace.write('\tplayer can now warp to the next level')
+                    trace.info('trigger',
+                        '\tplayer can now warp to the next level')
                     self.can_warp = True
                     self.post_msg('press > to warp to the next level',
                         color.message)
                 if '@message' in commands:
                     self.post_msg(user_data)
                 if '@upgrade' in commands:
-                    trace.write('giving player an upgrade token')
+                    trace.info('trigger', 'giving player an upgrade token')
                     self.allow_upgrade()
                 if '@dialogue' in commands:
                     self.show_dialogue(user_data)
                 if '@give' in commands:
                     rnd_name = self.random_identifier(obj.name)
                     give_data = user_data.replace('%', '@')
-                    trace.write('\tgiving "%s" interaction "%s" -> "%s"' %
-                        (obj.name, rnd_name, give_data))
+                    trace.debug('trigger',
+                        '\tgiving "%s" interaction "%s" -> "%s"',
+                        obj.name, rnd_name, give_data)
                     obj.properties[rnd_name] = (give_data)
                 if '@transmute' in commands:
                     gid_list = [int(i)
@@ -988,26 +1097,28 @@ class GameEngine(object):
                 if '@addcounter' in commands:
                     counter_value = obj.properties.get('counter', 0)
                     counter_value += 1
-                    trace.write('\tadd counter on "%s" to %s' %
-                        (obj.name, counter_value))
+                    trace.debug('trigger', '\tadd counter on "%s" to %s',
+                        obj.name, counter_value)
                     obj.properties['counter'] = counter_value
                 if '@clearcounter' in commands:
-                    trace.write('\tclearing counter on "%s"' % obj.name)
+                    trace.debug('trigger',
+                        '\tclearing counter on "%s"', obj.name)
                     obj.properties['counter'] = 0
                 if '@setattr' in commands:
-                    trace.write('altering objects within "%s"' % (obj.name))
+                    trace.debug('trigger',
+                        'altering objects within "%s"', obj.name)
                     self.alter_object_attributes(
                         obj.x, obj.y, obj.width, obj.height, user_data)
                 # do we repeat this interaction next time
                 if not '@repeat' in commands:
-                    trace.write('\tkill interaction "%s" on "%s"' %
-                        (name, obj.name))
+                    trace.debug('trigger', '\tkill interaction "%s" on "%s"',
+                        name, obj.name)
                     if name in obj.properties.keys():
                         del obj.properties[name]
                     else:
-                        trace.write(
-                            '\tProperty "%s" on "%s" already deleted.' %
-                            (name, obj.name))
+                        trace.warning('trigger',
+                            '\tProperty "%s" on "%s" already deleted.',
+                            name, obj.name)
         self.trigger_queue = requeue
 
     def alter_object_attributes(self, x, y, width, height, option_data):
@@ -1034,34 +1145,37 @@ class GameEngine(object):
 
         # get objects within the region
         objects = []
-        for x, y in rlhelper.iterate_square(x, y, width, height):
-            map_objects = self.get_object_by_xy(x, y)
-            for mo in map_objects:
-                # ignore non gid objects (like rect regions) and the player.
-                if mo.gid != -1 and mo is not self.player:
-                    # no filters grabs any object
-                    if not filters:
+        for mo in self.level.object_grid.in_rect(x, y, width, height):
+            # ignore non gid objects (like rect regions) and the player.
+            if mo.gid != -1 and mo is not self.player:
+                # no filters grabs any object
+                if not filters:
+                    objects.append(mo)
+                for f in filters:
+                    # fuzzy match by name
+                    if f[0] == 'name_filter' and f[1] in mo.name:
+                        objects.append(mo)
+                    # strict match by type
+                    elif f[0] == 'type_filter' and f[1] == mo.type:
                         objects.append(mo)
-                    for f in filters:
-                        # fuzzy match by name
-                        if f[0] == 'name_filter' and f[1] in mo.name:
-                            objects.append(mo)
-                        # strict match by type
-                        elif f[0] == 'type_filter' and f[1] == mo.type:
-                            objects.append(mo)
 
         # apply attributes to objects found
         for map_object in objects:
-            for alter_data in alters:
-                trace.write('\talter "%s": %s' % (map_object.name, alter_data))
+            for key, value in alters:
+                trace.debug('trigger',
+                    '\talter "%s": %s=%s', map_object.name, key, value)
                 # we know the 'modes' attribute is a list
-                if alter_data[0] == 'modes':
-                    alter_data[1] = alter_data[1].split(',')
+                if key == 'modes':
+                    value = value.split(',')
                 try:
-                    setattr(map_object, alter_data[0], float(str(alter_data[1])))
+                    setattr(map_object, key, float(str(value)))
                 except ValueError:
                     # that did not work, keep it a string
-                    setattr(map_object, alter_data[0], alter_data[1])
+                    setattr(map_object, key, value)
+            # positional alters need re-indexing
+            self.level.object_grid.update(map_object)
+            # as do type and speed alters
+            self.schedule_actor(map_object)
 
 
     def transmute_object(self, obj, gid_list):
@@ -1073,7 +1187,7 @@ class GameEngine(object):
 
         try:
             transmute_id = None
-            trace.write('Transmuting %s to gid %s' % (obj.name, gid_list))
+            trace.debug('map', 'Transmuting %s to gid %s', obj.name, gid_list)
             if len(gid_list) == 1:
                 # one-way transmutes
                 transmute_id = int(gid_list[0])
@@ -1084,8 +1198,8 @@ class GameEngine(object):
                     idx = gid_list.index(obj.gid) - 1
                     transmute_id = int(list(
                                         gid_list[idx:] + gid_list[:idx])[0])
-                    trace.write('Transmuting %s gid %s -> %s' %
-                        (obj.name, obj.gid, transmute_id))
+                    trace.debug('map', 'Transmuting %s gid %s -> %s',
+                        obj.name, obj.gid, transmute_id)
                 else:
                     # use first index
                     transmute_id = int(gid_list[0])
@@ -1096,7 +1210,7 @@ class GameEngine(object):
                 if (ff is not obj and
                     ff.type in ('ai', 'friend', 'player') and
                     self.story.tile_blocks(transmute_id)):
-                    trace.write('hey, you cant transmorgify a tile ' +
+                    trace.warning('map', 'hey, you cant transmorgify a tile '
                                 'to a solid if someone is standing on it :p')
                     return False
             # transmorgify!
@@ -1126,6 +1240,9 @@ class GameEngine(object):
             return False
         if defender.dead:
             return
+        # fighting wakes up sleeping characters
+        self.wake_actor(attacker)
+        self.wake_actor(defender)
         a, d = (attacker, defender)
         # we say 'you' where the player is involved
         a_name = (a is self.player) and ('you') or (a.name)
@@ -1138,7 +1255,7 @@ class GameEngine(object):
         # apply upgrade abilities
         echo = alu.from_list(defender.upgrades, alu.ECHO_LOOP)
         if echo and echo.is_active:
-            trace.write('%s has "echo" activated' % defender.name)
+            trace.debug('combat', '%s has "echo" activated', defender.name)
             # mitigate damage received and throw it back at the attacker.
             # each version will echo one eigth (12.5%) of the damage back.
             delta = a_atk * (float(echo.version) / 8)
@@ -1155,8 +1272,10 @@ class GameEngine(object):
             self.post_msg('%s %s %s for %s' %
                 (d_name, d_verb, a_name, d_atk), color.combat_message)
         # traces
-        trace.write('%s on %s health' % (attacker.name, attacker.health))
-        trace.write('%s on %s health' % (defender.name, defender.health))
+        trace.debug('combat', '%s on %s health',
+            attacker.name, attacker.health)
+        trace.debug('combat', '%s on %s health',
+            defender.name, defender.health)
         # death
         if a.health <= 0:
             if a is self.player:
@@ -1232,7 +1351,8 @@ class GameEngine(object):
             # change our state to dialogue mode
             self.post(StateChangeEvent(STATE_DIALOG))
         else:
-            trace.write('dialogue "%s" not found in story definition' % (key))
+            trace.warning('story',
+                'dialogue "%s" not found in story definition', key)
 
     def install_upgrade(self, upgrade_name):
         """
@@ -1245,17 +1365,18 @@ class GameEngine(object):
         upgrade = alu.from_list(self.player.upgrades, upgrade_name)
         if upgrade:
             upgrade.version_up()
-            trace.write('upgrading "%s"' % upgrade_name)
+            trace.info('upgrade', 'upgrading "%s"', upgrade_name)
             status = 'upgraded %s (v%s)' % (upgrade_name, upgrade.version)
         else:
             # else get an instance of it and add it to the player.
-            trace.write('installing "%s"' % upgrade_name)
+            trace.info('upgrade', 'installing "%s"', upgrade_name)
             upgrade = alu.from_name(upgrade_name)
             if upgrade:
                 self.player.upgrades.append(upgrade)
                 status = 'installed %s' % upgrade_name
         # apply upgrade abilities
         result = upgrade.apply_upgrade(self.player)
+        self.schedule_actor(self.player)
         if status or result:
             self.upgrades_available -= 1
             # look around again if any abilities upgraded our perception
@@ -1288,24 +1409,20 @@ class GameEngine(object):
         w, h = level.width, level.height
         first_match = None
         choose_next = False
-        breaked = False
-
-        for x, y in rlhelper.cover_area(origin_x, origin_y, reach, w, h):
-            objs = self.get_object_by_xy(x, y)
-            for obj in [o for o in objs if o.in_range and o.type in type_list]:
-                if not first_match:
-                    first_match = obj
-                if choose_next:
-                    first_match = obj
-                    breaked = True
-                    break
-                if obj is last_selected:
-                    choose_next = True
-            if breaked:
+
+        objs = self.level.object_grid.in_radius(
+            origin_x, origin_y, reach, w, h)
+        for obj in [o for o in objs if o.in_range and o.type in type_list]:
+            if not first_match:
+                first_match = obj
+            if choose_next:
+                first_match = obj
                 break
+            if obj is last_selected:
+                choose_next = True
         self.target_object = first_match
         if first_match:
-            trace.write('targeted %s' % first_match.name)
+            trace.debug('upgrade', 'targeted %s', first_match.name)
 
     def use_upgrade(self, upgrade_name):
         """
@@ -1317,10 +1434,11 @@ class GameEngine(object):
         # it requires a target.
         upgrade = alu.from_list(self.player.upgrades, upgrade_name)
         if not upgrade:
-            trace.write('"%s" is not an upgrade the player has' % upgrade_name)
+            trace.info('upgrade',
+                '"%s" is not an upgrade the player has', upgrade_name)
             return
         if not upgrade.enabled:
-            trace.write('"%s" is not enabled' % upgrade_name)
+            trace.info('upgrade', '"%s" is not enabled', upgrade_name)
             return
         if upgrade.use_targeting and self.target_object is None:
             self.post_msg('Select a target first', color.tip)
@@ -1332,12 +1450,12 @@ class GameEngine(object):
                 self.player.x, self.player.y, upgrade.reach)
             # grab a sample of max_targets.
             if upgrade.max_targets < len(targets):
-                targets = random.sample(targets, upgrade.max_targets)
+                targets = self.random.sample(targets, upgrade.max_targets)
         else:
             targets = [self.target_object] if self.target_object else None
 
-        if targets:
-            trace.write('targets in reach: %s' %
+        if targets and trace.enabled(trace.DEBUG, 'upgrade'):
+            trace.debug('upgrade', 'targets in reach: %s',
                 ', '.join([t.name for t in targets]))
 
         # test for enough power to pay the upgrade ability cost
@@ -1456,11 +1574,11 @@ class GameEngine(object):
 
     def queue_event(self, event, seconds_delay):
         """
-        Queue an event for posting at the end of the player's turn.
+        Queue an event for posting after a delay in seconds.
 
         """
 
-        self.event_queue[event] = seconds_delay * FPS
+        self.frame_timer.schedule(event, seconds_delay * FPS)
 
     def post(self, event):
         """
@@ -1483,8 +1601,7 @@ class GameEngine(object):
         elif event.request_type == 'restart level':
             self.restart_level()
         elif event.request_type == 'reveal map':
-            self.level.matrix['seen'] = rlhelper.make_matrix(
-                self.level_width, self.level_height, 1)
+            self.level.matrix['seen'].fill(1)
             for obj in self.objects:
                 obj.seen = True
             self.look_around()
@@ -1499,6 +1616,13 @@ class GameEngine(object):
             if level_index:
                 self.level_number = level_index
                 self.warp_level(restart=True)
+        elif event.request_type == 'event stats':
+            # dump the stats we have, or start recording some
+            if self.evManager.stats:
+                self.evManager.stats.dump(EVENT_STATS_FILE)
+            else:
+                self.evManager.stats = EventStats()
+                trace.info('event', 'recording event stats')
 
 
     def stories_list(self):
@@ -1573,7 +1697,7 @@ class GameEngine(object):
 
         if self.game_slot > 0:
             fn = 'savedgame%s' % (self.game_slot)
-            trace.write('writing %s' % fn)
+            trace.info('save', 'writing %s', fn)
             if self.game_in_progress:
                 jar = pickle.Pickler(open(fn, 'w'))
                 jar.dump(VERSION)
@@ -1584,6 +1708,8 @@ class GameEngine(object):
                 jar.dump(self.upgrades_available)
                 jar.dump(self.recent_messages)
                 jar.dump(self.store['player copy'])
+                jar.dump(self.seed)
+                jar.dump(self.random.getstate())
                 jar = None
 
     def load_game(self):
@@ -1594,7 +1720,7 @@ class GameEngine(object):
         if self.game_slot > 0:
             fn = 'savedgame%s' % (self.game_slot)
             if os.path.exists(fn):
-                trace.write('loading %s' % (fn))
+                trace.info('save', 'loading %s', fn)
                 jar = pickle.Unpickler(open(fn, 'r'))
                 saved_version = jar.load()
                 saved_time = jar.load()
@@ -1604,6 +1730,13 @@ class GameEngine(object):
                 self.upgrades_available = jar.load()
                 self.recent_messages = jar.load()
                 self.player = jar.load()
+                try:
+                    self.seed = jar.load()
+                    self.random.setstate(jar.load())
+                except EOFError:
+                    # games saved before we saved the random state
+                    # carry on with the seed begin_game gave us
+                    pass
                 jar = None
 
     def about_game_data(self):
@@ -1671,11 +1804,21 @@ class GameLevel(object):
 
         filename (str): relative path to the level file.
         data (TMXParser): tmx file data.
+        matrix (dict): block and seen matrices of the level tiles.
+        object_grid (ObjectGrid): spatial index of the level objects.
+        visible_tiles (set): (x, y) positions in view of the player.
+        objects_in_range (set): objects in view of the player.
+        actor_schedule (ActorSchedule): the level characters, by the
+            turns they act on.
+        wake_radius (float): the largest activation radius of the level
+            characters, the reach we wake sleepers within.
+        fog_changes (set): (x, y) positions that entered or left the
+            player's view since the view last redrew its fog.
         """
 
         self.filename = filename
         self.tmx = TMXParser(filename)
-        trace.write('loaded tmx data OK')
+        trace.info('level', 'loaded tmx data OK')
 
         # store the level map data in our map matrix.
         self.matrix = {}
@@ -1685,6 +1828,15 @@ class GameLevel(object):
         self.matrix['block'] = rlhelper.make_matrix(w, h, 0)
         # and a matrix of tiles seen (it update as the player moves around)
         self.matrix['seen'] = rlhelper.make_matrix(w, h, 0)
+        # index level objects by position for quick lookups
+        self.object_grid = rlhelper.ObjectGrid()
+        # and characters by the next turn they act on
+        self.actor_schedule = rlhelper.ActorSchedule()
+        self.wake_radius = 0
+        # the tiles and objects in the player's view as of the last turn
+        self.visible_tiles = set()
+        self.objects_in_range = set()
+        self.fog_changes = set()
 
 
 class StateMachine(object):
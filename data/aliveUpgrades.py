@@ -490,8 +490,8 @@ class Upgrade(object):
         if self.ready:
             self._busy_countdown = self.duration
             self._cooldown_count = self.cooldown
-            trace.write('activated "%s" for %s turns' %
-                (self.name, self._busy_countdown))
+            trace.debug('upgrade', 'activated "%s" for %s turns',
+                self.name, self._busy_countdown)
 
     def step(self):
         """
@@ -502,14 +502,14 @@ class Upgrade(object):
 
         if self._busy_countdown > 0:
             self._busy_countdown -= 1
-            trace.write('%s is active for %s turns' %
-                (self.name, self._busy_countdown))
+            trace.debug('upgrade', '%s is active for %s turns',
+                self.name, self._busy_countdown)
             if self._busy_countdown == 0:
                 return '%s deactivates' % (self.name,)
         elif self._cooldown_count > 0:
             self._cooldown_count -= 1
-            trace.write('%s cooldown for %s turns' %
-                (self.name, self._cooldown_count))
+            trace.debug('upgrade', '%s cooldown for %s turns',
+                self.name, self._cooldown_count)
 
 
 def from_level(level):
@@ -15,6 +15,7 @@ import os
 import sys
 import random
 import textwrap
+import numpy
 import pygame
 from pygame import image
 from pygame.locals import *
@@ -29,6 +30,7 @@ from aliveViewClasses import *
 from eventmanager import *
 from tmxparser import TMXParser
 from tmxparser import TilesetParser
+from tmxparser import TilesetCache
 
 
 class GraphicalView(object):
@@ -82,6 +84,53 @@ class GraphicalView(object):
     sprites (Dict):
         A sprite lookup by object id.
 
+    tilesets (TilesetCache):
+        Tileset images kept across level warps and restarts.
+
+    tilesets_story (str):
+        The story path the cached tilesets belong to. The cache is cleared
+        when a level from a different story loads.
+
+    redraw (bool):
+        Set when the game changed since the last render. With
+        RENDER_ON_CHANGE we only render when this is set or when
+        something is animating, otherwise we wait for input.
+
+    dirty_rects (list):
+        Screen areas that changed during the current render.
+
+    full_update (bool):
+        Set when the whole screen needs to be pushed to the display,
+        instead of only the dirty_rects.
+
+    last_render_state (int):
+        The model state of the last render.
+
+    last_transition_rect (Rect):
+        The screen area of the transition drawn on the last render.
+
+    random (Random):
+        Varies sprite animation speeds. It is reseeded from the game seed
+        on each level, and kept apart from the model's random, so that
+        drawing does not change how a seeded game plays.
+
+    map_chunks (dict):
+        Pre-rendered static map tiles by (column, row) chunk index.
+        Each chunk covers MAP_CHUNK_TILES square tiles of all tile layers.
+
+    fog_chunks (dict):
+        The fog overlay by (column, row) chunk index, in the same chunks
+        as map_chunks. Chunks are rendered when first drawn and kept in
+        step with the level fog_changes. They are dropped when the level
+        changes.
+
+    fog_level (GameLevel):
+        The level our fog_chunks belong to.
+
+    map_chunk_reveals (dict):
+        Partly seen chunks by chunk index, stored as a (seen mask, Surface)
+        pair, where the surface only shows the seen tiles of its chunk.
+
     messages (list):
         list of recent game messages.
 
@@ -96,13 +145,32 @@ class GraphicalView(object):
 
     def __init__(self, evManager, model):
         """
-        evManager controls Post()ing and notify()ing events.
+        evManager controls Post()ing events to our handlers.
         model gives us a strong reference to what we need to draw.
 
         """
 
         self.evManager = evManager
-        evManager.RegisterListener(self)
+        evManager.RegisterListener(self, {
+            # any event we do not handle may still have changed the game
+            Event: self.guard(None),
+            TickEvent: self.guard(self.on_tick, changes=False),
+            CharacterMovedEvent: self.guard(self.move_sprite),
+            PlayerMovedEvent: self.guard(self.on_player_moved),
+            MessageEvent: self.guard(self.on_message),
+            KillCharacterEvent: self.guard(self.on_kill_character),
+            UpdateObjectGID: self.guard(self.transmute_sprite),
+            TargetTileEvent: self.guard(self.on_target_tile),
+            DialogueEvent: self.guard(self.on_dialogue),
+            NextLevelEvent: self.guard(self.on_next_level),
+            InitializeEvent: self.guard(self.on_initialize),
+            QuitEvent: self.guard(self.on_quit),
+            DebugEvent: self.guard(self.on_debug),
+            InputEvent: self.guard(self.on_input),
+            StateChangeEvent: self.guard(self.on_state_change),
+            StateSwapEvent: self.guard(self.on_state_change),
+            RefreshUpgradesEvent: self.guard(self.on_refresh_upgrades),
+            })
         self.model = model
         self.isinitialized = False
         self.screen = None
@@ -118,6 +186,18 @@ class GraphicalView(object):
         self.viewport_shift = None
         self.windowsize = None
         self.sprites = {}
+        self.tilesets = TilesetCache()
+        self.random = random.Random()
+        self.tilesets_story = None
+        self.map_chunks = {}
+        self.map_chunk_reveals = {}
+        self.fog_chunks = {}
+        self.fog_level = None
+        self.redraw = True
+        self.dirty_rects = []
+        self.full_update = True
+        self.last_render_state = None
+        self.last_transition_rect = None
         self.message_sprites = []
         self.last_tip_pos = 0
         self.transition_queue = []
@@ -170,91 +250,152 @@ class GraphicalView(object):
 
         self.evManager.Post(event)
 
-    def notify(self, event):
+    def guard(self, handler, changes=True):
         """
-        Called by an event in the message queue.
+        Wrap an event handler so that errors it raises post a CrashEvent.
+        changes notes that the event may change what we draw.
+        handler may be None to only note the change.
         """
 
-        try:
-            if isinstance(event, TickEvent):
-                self.render()
-                self.clock.tick(FPS)
+        def guarded(event):
+            try:
+                if changes:
+                    self.redraw = True
+                if handler:
+                    handler(event)
+            except Exception, e:
+                # we explicitly catch Exception, since sys.exit() will throw
+                # a SystemExit, and we want that one to not catch here.
+                # That means we drop to the terminal if sys.exit() is used.
+                self.evManager.Post(CrashEvent())
+        return guarded
+
+    def on_tick(self, event):
+        """
+        Render the next frame.
+        """
 
-            elif isinstance(event, CharacterMovedEvent):
-                self.move_sprite(event)
+        if not RENDER_ON_CHANGE or self.redraw:
+            self.redraw = False
+            self.render()
+            self.clock.tick(FPS)
+        else:
+            self.render_when_due()
 
-            elif isinstance(event, PlayerMovedEvent):
-                self.update_viewport()
-                self.update_button_borders()
-                self.update_graphs()
-
-            elif isinstance(event, MessageEvent):
-                self.create_floating_tip(event.message,
-                    event.color and event.color or color.message)
-
-            elif isinstance(event, KillCharacterEvent):
-                self.kill_sprite(event.character)
-
-            elif isinstance(event, UpdateObjectGID):
-                self.transmute_sprite(event)
-
-            elif isinstance(event, TargetTileEvent):
-                self.model.target_next()
-
-            elif isinstance(event, DialogueEvent):
-                self.queue_dialogue(event.dialogue)
-
-            elif isinstance(event, NextLevelEvent):
-                self.load_level()
-                self.create_sprites()
-                # pre-render the map and sprite images for any warp transitions
-                self.render()
-                self.queue_warp_transitions()
-
-            elif isinstance(event, InitializeEvent):
-                self.initialize()
-
-            elif isinstance(event, QuitEvent):
-                self.isinitialized = False
-                pygame.quit()
-
-            elif isinstance(event, DebugEvent):
-                if event.request_type == 'animation cheatsheet':
-                    self.draw_animations_cheatsheet()
-                    self.draw_number_cheatsheet()
-
-            elif isinstance(event, InputEvent):
-                if self.ui:
-                    if event.char:
-                        self.ui.click(event.char)
-                    else:
-                        self.ui.unclick()
-
-            elif (isinstance(event, StateChangeEvent) or
-                    isinstance(event, StateSwapEvent)):
-                model_state = self.model.state.peek()
-                if self.ui:
-                    self.reposition_upgrade_buttons(model_state)
-                    trace.write('set ui context to game state %s' %
-                        model_state)
-                    self.ui.set_context(model_state)
-
-                if event.state == STATE_HELP:
-                    self.show_help_screens()
-                elif event.state == STATE_LEVEL_FAIL:
-                    # housekeeping: reset some things for level restart
-                    self.message_sprites = []
-                    self.queue_slide_transition('', None, color.ai_crash)
-
-            elif isinstance(event, RefreshUpgradesEvent):
-                model_state = self.model.state.peek()
-                self.reposition_upgrade_buttons(model_state)
+    def on_player_moved(self, event):
+        """
+        Follow the player and update the stats they affect.
+        """
 
-        except Exception, e:
-            # we explicitly catch Exception, since sys.exit() will throw
-            # a SystemExit, and we want that one to not catch here.
-            # That means we drop to the terminal if sys.exit() is used.
-            self.evManager.Post(CrashEvent())
+        self.update_viewport()
+        self.update_button_borders()
+        self.update_graphs()
+
+    def on_message(self, event):
+        """
+        Show a message as a floating tip.
+        """
+
+        self.create_floating_tip(event.message,
+            event.color and event.color or color.message)
+
+    def on_kill_character(self, event):
+        """
+        Remove the sprite of a killed character.
+        """
+
+        self.kill_sprite(event.character)
+
+    def on_target_tile(self, event):
+        """
+        Target the next object in range.
+        """
+
+        self.model.target_next()
+
+    def on_dialogue(self, event):
+        """
+        Queue a dialogue to show.
+        """
+
+        self.queue_dialogue(event.dialogue)
+
+    def on_next_level(self, event):
+        """
+        Prepare the sprites and images of a new level.
+        """
+
+        self.full_update = True
+        self.load_level()
+        self.clear_map_chunks()
+        self.create_sprites()
+        # pre-render the map and sprite images for any warp transitions
+        self.render()
+        self.queue_warp_transitions()
+
+    def on_initialize(self, event):
+        """
+        Set up the display.
+        """
+
+        self.initialize()
+        self.full_update = True
+
+    def on_quit(self, event):
+        """
+        Shut down the display.
+        """
+
+        self.isinitialized = False
+        pygame.quit()
+
+    def on_debug(self, event):
+        """
+        Perform view debug commands.
+        """
+
+        if event.request_type == 'animation cheatsheet':
+            self.draw_animations_cheatsheet()
+            self.draw_number_cheatsheet()
+
+    def on_input(self, event):
+        """
+        Pass key presses on to the ui.
+        """
+
+        if self.ui:
+            if event.char:
+                self.ui.click(event.char)
+            else:
+                self.ui.unclick()
+
+    def on_state_change(self, event):
+        """
+        Set the ui context and show any screens for the new state.
+        """
+
+        self.full_update = True
+        model_state = self.model.state.peek()
+        if self.ui:
+            self.reposition_upgrade_buttons(model_state)
+            trace.debug('ui', 'set ui context to game state %s',
+                model_state)
+            self.ui.set_context(model_state)
+
+        if event.state == STATE_HELP:
+            self.show_help_screens()
+        elif event.state == STATE_LEVEL_FAIL:
+            # housekeeping: reset some things for level restart
+            self.message_sprites = []
+            self.queue_slide_transition('', None, color.ai_crash)
+
+    def on_refresh_upgrades(self, event):
+        """
+        Reposition upgrade buttons after the upgrades changed.
+        """
+
+        model_state = self.model.state.peek()
+        self.reposition_upgrade_buttons(model_state)
 
     def render(self):
         """
@@ -285,6 +426,7 @@ class GraphicalView(object):
             sys.exit(1)
 
         self.shift_viewport()
+        self.dirty_rects = []
 
         # reset the main image by painting a background over it
         self.image.blit(self.defaultbackground, (0, 0))
@@ -310,6 +452,7 @@ class GraphicalView(object):
             self.draw_fog()
             self.draw_scroller_text()
             self.image.blit(self.play_image, self.play_area)
+            self.dirty_rects.append(self.play_area)
 
         elif state in (STATE_MENU_MAIN,
                         STATE_MENU_SAVED,
@@ -321,19 +464,107 @@ class GraphicalView(object):
         #       since those use the TransitionBase, which draws itself below.
 
         # apply any transitions (including dialogues and help screens)
-        if self.transition:
-            self.transition.update(pygame.time.get_ticks())
-            self.image.blit(self.transition.image, (0, 0))
-        self.step_transitions()
+        self.draw_transition()
 
         # finally draw our composed image onto the screen
         self.screen.blit(self.image, self.game_area)
+        self.dirty_rects = [r.move(self.game_area.topleft)
+                            for r in self.dirty_rects]
 
         # update the ui and draw it to the main image
         self.ui.update()
         self.screen.blit(self.ui.image, (0, 0))
+        self.dirty_rects.extend(self.ui.dirty_rects)
+
+        # only play screens track their changes, others are mostly static
+        if state != STATE_PLAY or state != self.last_render_state:
+            self.full_update = True
+        self.last_render_state = state
+        self.update_display()
+
+    def update_display(self):
+        """
+        Push the dirty screen areas to the display, or flip the whole
+        display if most of it changed.
+        """
+
+        if not self.full_update:
+            dirty_area = sum(r.width * r.height for r in self.dirty_rects)
+            window_area = self.windowsize.width * self.windowsize.height
+            self.full_update = dirty_area > window_area * FULL_FLIP_RATIO
+        if self.full_update:
+            self.full_update = False
+            pygame.display.flip()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+
+    def next_animation(self):
+        """
+        Returns the milliseconds until something on screen changes by
+        itself, 0 if something is busy animating, or None if everything
+        is at rest.
+        """
+
+        if self.transition:
+            if not (self.transition.done and self.transition.waitforkey):
+                return 0
+        if self.ui and self.ui.is_animating:
+            return 0
+        if self.viewport:
+            if self.viewport.topleft != self.viewport_shift.topleft:
+                return 0
+        state = self.model.state.peek()
+        ticks = pygame.time.get_ticks()
+        due = None
+        if state in (STATE_PLAY, STATE_LEVEL_FAIL):
+            # graphs with new values wait for their next frame slot
+            for graph in self.graphs.values():
+                wait = graph.next_update(ticks)
+                if wait == 0:
+                    return 0
+                if wait is not None and (due is None or wait < due):
+                    due = wait
+        if state != STATE_PLAY:
+            return due
+        if self.message_sprites:
+            return 0
+        for obj in self.nearby_objects():
+            sprite = self.sprites.get(id(obj), None)
+            if sprite:
+                wait = sprite.next_update(ticks)
+                if wait == 0:
+                    return 0
+                if wait is not None and (due is None or wait < due):
+                    due = wait
+        return due
+
+    def render_when_due(self):
+        """
+        Render if something is animating. Otherwise sleep until either
+        input arrives or the next sprite animation frame is due.
+        """
+
+        # the model counts delayed events in ticks, keep them flowing,
+        # as well as any queued events still waiting for delivery.
+        if self.model.frame_timer or self.evManager.pending:
+            due = 0
+        else:
+            due = self.next_animation()
+        if due == 0:
+            self.render()
+            self.clock.tick(FPS)
+            return
 
-        pygame.display.flip()
+        if due:
+            pygame.time.set_timer(RENDER_WAKE_EVENT, due)
+        event = pygame.event.wait()
+        pygame.time.set_timer(RENDER_WAKE_EVENT, 0)
+        # leave the input for our controller to handle on the next tick
+        if event.type != RENDER_WAKE_EVENT:
+            pygame.event.post(event)
+        self.redraw = True
+        # reset the clock so it does not count our sleep as frame time
+        self.clock.tick()
 
     def draw_animations_cheatsheet(self):
         """
@@ -520,78 +751,237 @@ class GraphicalView(object):
         """
 
         # start by drawing the level map on our play image.
+        self.draw_map_chunks()
+
         ticks = pygame.time.get_ticks()
-        # for each sprite in our viewport range
-        for y in range(0, self.tmx.height):
-            for x in range(0, self.tmx.width):
-
-                # draw static map tiles
-                if self.model.seen_tile(x, y):
-                    for layer in self.tmx.tilelayers:
-                        gid = layer.at((x, y))
-                        tile = self.tsp[gid]
-                        if tile:
-                            new_rect = (
-                                x * self.tile_w - self.viewport.left,
-                                y * self.tile_h - self.viewport.top)
-                            self.play_image.blit(tile, new_rect)
-
-                # draw movable sprite objects at this location
-                object_list = self.model.get_object_by_xy(x, y)
-                for obj in object_list:
-                    # grab the sprite that match this object id
-                    sprite = self.sprites.get(id(obj), None)
-                    # test if this is a character within view range
-                    if obj.type in ('ai', 'friend', 'player'):
-                        if obj.in_range:
-                            visible = True
-                        else:
-                            visible = False
-                    # or not a character, but has been seen before
-                    elif obj.seen:
-                        visible = True
-                    else:
-                        visible = False
-                    # draw if both are happy
-                    if sprite:
-                        # update the sprite animation.
-                        sprite.update(ticks)
-                        if visible:
-                            # our play_image is only the size of the screen
-                            # we update sprite positions, which are relative to
-                            # entire map, by subtracting the viewport location.
-                            new_rect = sprite.rect.move(
-                                -self.viewport.left, -self.viewport.top)
-                            self.play_image.blit(sprite.image, new_rect)
+        # only objects near the viewport animate and get drawn.
+        for obj in self.nearby_objects():
+            # grab the sprite that match this object id
+            sprite = self.sprites.get(id(obj), None)
+            # test if this is a character within view range
+            if obj.type in ('ai', 'friend', 'player'):
+                if obj.in_range:
+                    visible = True
+                else:
+                    visible = False
+            # or not a character, but has been seen before
+            elif obj.seen:
+                visible = True
+            else:
+                visible = False
+            # draw if both are happy
+            if sprite:
+                # update the sprite animation.
+                sprite.update(ticks)
+                if visible:
+                    # our play_image is only the size of the screen
+                    # we update sprite positions, which are relative to
+                    # entire map, by subtracting the viewport location.
+                    new_rect = sprite.rect.move(
+                        -self.viewport.left, -self.viewport.top)
+                    self.play_image.blit(sprite.image, new_rect)
+
+    def nearby_objects(self):
+        """
+        Returns the objects within VIEWPORT_MARGIN_TILES of the viewport,
+        from the top row down, so that lower objects overlap those above.
+        """
+
+        x1, y1, x2, y2 = self.viewport_tiles(VIEWPORT_MARGIN_TILES)
+        nearby = self.model.level.object_grid.in_rect(
+            x1, y1, x2 - x1, y2 - y1)
+        return sorted(nearby, key=lambda o: (o.y, o.x))
+
+    def viewport_tiles(self, margin=0):
+        """
+        Returns the (x1, y1, x2, y2) tile bounds that intersect the
+        viewport, grown by margin tiles and clipped to the map.
+        x2 and y2 are exclusive.
+        """
+
+        x1 = self.viewport.left / self.tile_w - margin
+        y1 = self.viewport.top / self.tile_h - margin
+        x2 = (self.viewport.right - 1) / self.tile_w + 1 + margin
+        y2 = (self.viewport.bottom - 1) / self.tile_h + 1 + margin
+        return (max(0, x1), max(0, y1),
+                min(self.tmx.width, x2), min(self.tmx.height, y2))
+
+    def viewport_chunks(self):
+        """
+        Yields the (column, row) index of each map chunk that intersects
+        the viewport.
+        """
+
+        chunk_w = MAP_CHUNK_TILES * self.tile_w
+        chunk_h = MAP_CHUNK_TILES * self.tile_h
+        columns = (self.tmx.width - 1) / MAP_CHUNK_TILES
+        rows = (self.tmx.height - 1) / MAP_CHUNK_TILES
+        left = max(0, self.viewport.left / chunk_w)
+        top = max(0, self.viewport.top / chunk_h)
+        right = min(columns, (self.viewport.right - 1) / chunk_w)
+        bottom = min(rows, (self.viewport.bottom - 1) / chunk_h)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                yield (cx, cy)
+
+    def draw_map_chunks(self):
+        """
+        Draw the static map tiles that are inside the viewport, from
+        pre-rendered chunks. Only tiles the player has seen are drawn.
+        """
+
+        chunk_w = MAP_CHUNK_TILES * self.tile_w
+        chunk_h = MAP_CHUNK_TILES * self.tile_h
+        for cx, cy in self.viewport_chunks():
+            chunk = self.revealed_map_chunk(cx, cy)
+            if chunk:
+                self.play_image.blit(chunk, (
+                    cx * chunk_w - self.viewport.left,
+                    cy * chunk_h - self.viewport.top))
+
+    def clear_map_chunks(self):
+        """
+        Forget all pre-rendered map chunks, they are rebuilt as needed.
+        """
+
+        self.map_chunks = {}
+        self.map_chunk_reveals = {}
+
+    def map_chunk_bounds(self, cx, cy):
+        """
+        Returns the (x1, y1, x2, y2) tile bounds of a chunk.
+        x2 and y2 are exclusive.
+        """
+
+        x1 = cx * MAP_CHUNK_TILES
+        y1 = cy * MAP_CHUNK_TILES
+        x2 = min(x1 + MAP_CHUNK_TILES, self.tmx.width)
+        y2 = min(y1 + MAP_CHUNK_TILES, self.tmx.height)
+        return (x1, y1, x2, y2)
+
+    def map_chunk(self, cx, cy):
+        """
+        Get the pre-rendered image of all tile layers for a chunk.
+        It is rendered on first use since tile layers never change.
+        """
+
+        chunk = self.map_chunks.get((cx, cy), None)
+        if chunk:
+            return chunk
+        x1, y1, x2, y2 = self.map_chunk_bounds(cx, cy)
+        chunk = pygame.Surface(
+            ((x2 - x1) * self.tile_w, (y2 - y1) * self.tile_h))
+        chunk.fill(color.magenta)
+        chunk.set_colorkey(color.magenta)
+        width = self.tmx.width
+        for layer in self.tmx.tilelayers:
+            for y in range(y1, y2):
+                row = layer.data[y * width + x1:y * width + x2]
+                ypos = (y - y1) * self.tile_h
+                for n, tile in enumerate(self.tsp.tiles(row)):
+                    if tile:
+                        chunk.blit(tile, (n * self.tile_w, ypos))
+        self.map_chunks[(cx, cy)] = chunk
+        return chunk
+
+    def revealed_map_chunk(self, cx, cy):
+        """
+        Get the image of a chunk showing only the tiles the player has seen.
+        Returns None if none of the tiles were seen.
+        """
+
+        x1, y1, x2, y2 = self.map_chunk_bounds(cx, cy)
+        seen = self.model.level.matrix['seen'][x1:x2, y1:y2] > 0
+        seen_count = numpy.count_nonzero(seen)
+        if seen_count == 0:
+            return None
+        if seen_count == seen.size:
+            # fully seen chunks need no masking
+            self.map_chunk_reveals.pop((cx, cy), None)
+            return self.map_chunk(cx, cy)
+
+        chunk = self.map_chunk(cx, cy)
+        last_seen, reveal = self.map_chunk_reveals.get(
+            (cx, cy), (None, None))
+        if reveal is None:
+            last_seen = numpy.zeros(seen.shape, dtype=bool)
+            reveal = pygame.Surface(chunk.get_size())
+            reveal.fill(color.magenta)
+            reveal.set_colorkey(color.magenta)
+        # tiles stay seen once seen, so we only copy over new ones
+        for x, y in zip(*numpy.nonzero(seen & ~last_seen)):
+            area = pygame.Rect(
+                x * self.tile_w, y * self.tile_h, self.tile_w, self.tile_h)
+            reveal.blit(chunk, area, area)
+        self.map_chunk_reveals[(cx, cy)] = (seen, reveal)
+        return reveal
 
     def draw_fog(self):
         """
         Overlay fog on the level for that which is out of player view.
         """
 
-        unseen_sprite = self.tsp[UNSEEN_GID]
+        level = self.model.level
+        if self.fog_level is not level:
+            self.fog_level = level
+            self.fog_chunks = {}
+        elif level.fog_changes:
+            self.update_fog(level.fog_changes)
+        level.fog_changes.clear()
+
+        chunk_w = MAP_CHUNK_TILES * self.tile_w
+        chunk_h = MAP_CHUNK_TILES * self.tile_h
+        for cx, cy in self.viewport_chunks():
+            self.play_image.blit(self.fog_chunk(cx, cy), (
+                cx * chunk_w - self.viewport.left,
+                cy * chunk_h - self.viewport.top))
+
+    def fog_chunk(self, cx, cy):
+        """
+        Get the fog overlay image of a chunk, rendering it on first use.
+        """
+
+        chunk = self.fog_chunks.get((cx, cy), None)
+        if chunk:
+            return chunk
+        x1, y1, x2, y2 = self.map_chunk_bounds(cx, cy)
+        chunk = pygame.Surface(
+            ((x2 - x1) * self.tile_w, (y2 - y1) * self.tile_h))
+        chunk.fill(color.magenta)
+        chunk.set_colorkey(color.magenta)
+        self.fog_chunks[(cx, cy)] = chunk
+        # lookup which positions are out of view: not yet seen (0) or
+        # seen but out of range (1). overlay those with FOG_GID.
+        #NOTE: unseen tiles could use UNSEEN_GID instead.
         fog_sprite = self.tsp[FOG_GID]
+        fogged = self.fog_level.matrix['seen'][x1:x2, y1:y2] != 2
+        for x, y in zip(*numpy.nonzero(fogged)):
+            chunk.blit(fog_sprite, (x * self.tile_w, y * self.tile_h))
+        return chunk
+
+    def update_fog(self, positions):
+        """
+        Redraw the fog overlay at the given (x, y) tile positions.
+        Only chunks already rendered are redrawn, the others render
+        with the current fog when first drawn.
+        """
 
-        for y in range(0, self.tmx.height):
-            for x in range(0, self.tmx.width):
-                # lookup list of which positions has been seen
-                # and overlay those with FOG_GID, the rest with UNSEEN_GID
-                seen = self.model.level.matrix['seen'][x][y]
-
-                # because our play_image is only the size of the screen
-                # we accommodate sprite positions, which are relative to
-                # an entire map, by subtracting the viewport location.
-                new_rect = (
-                    x * self.tile_w - self.viewport.left,
-                    y * self.tile_h - self.viewport.top)
-
-                # not yet seen
-                if seen == 0:
-                    # self.play_image.blit(unseen_sprite, new_rect)
-                    self.play_image.blit(fog_sprite, new_rect)
-                # seen but out of range
-                elif seen == 1:
-                    self.play_image.blit(fog_sprite, new_rect)
+        fog_sprite = self.tsp[FOG_GID]
+        seen_mx = self.fog_level.matrix['seen']
+        for x, y in positions:
+            cx = x / MAP_CHUNK_TILES
+            cy = y / MAP_CHUNK_TILES
+            chunk = self.fog_chunks.get((cx, cy), None)
+            if not chunk:
+                continue
+            new_rect = pygame.Rect(
+                (x - cx * MAP_CHUNK_TILES) * self.tile_w,
+                (y - cy * MAP_CHUNK_TILES) * self.tile_h,
+                self.tile_w, self.tile_h)
+            if seen_mx[x, y] == 2:
+                chunk.fill(color.magenta, new_rect)
+            else:
+                chunk.blit(fog_sprite, new_rect)
 
     def draw_scroller_text(self):
         """
@@ -610,6 +1000,23 @@ class GraphicalView(object):
                     -self.viewport.left, -self.viewport.top)
                 self.play_image.blit(sprite.image, new_rect)
 
+    def draw_transition(self):
+        """
+        Draw the current transition over the image, and move on to the next
+        one when it is done.
+        """
+
+        transition_rect = None
+        if self.transition:
+            self.transition.update(pygame.time.get_ticks())
+            transition_rect = self.image.blit(self.transition.image, (0, 0))
+            self.dirty_rects.append(transition_rect)
+        # the area under a finished transition changed too
+        if self.last_transition_rect:
+            self.dirty_rects.append(self.last_transition_rect)
+        self.last_transition_rect = transition_rect
+        self.step_transitions()
+
     def step_transitions(self):
         """
         Move to teh next queued transition if the current one is done and
@@ -671,7 +1078,7 @@ class GraphicalView(object):
 
         """
 
-        trace.write('showing dialogue "%s"' % dialogue.name)
+        trace.info('story', 'showing dialogue "%s"', dialogue.name)
         # we only need one slide-in transition for many screens.
         terminal_slidein_added = False
         # a dialogue may contain multiple screens. Keep this in mind.
@@ -763,7 +1170,8 @@ class GraphicalView(object):
 
         ticks = pygame.time.get_ticks()
         for key, graph in self.graphs.items():
-            graph.update(ticks)
+            if graph.update(ticks):
+                self.dirty_rects.append(graph.rect.union(graph.title_rect))
             graph.draw(self.image)
 
     def draw_messages(self, x, y,
@@ -871,10 +1279,15 @@ class GraphicalView(object):
         Note: we only support the first tilset as defined in the self.tmx.
         """
 
+        self.random.seed((self.model.seed or 0) + self.model.level_number)
         story = self.model.story
+        # tilesets are reused across levels of the same story
+        if self.tilesets_story != story.path:
+            self.tilesets.clear()
+            self.tilesets_story = story.path
         #tilesetfile = os.path.join(story.path, self.tmx.tilesets[0].source)
         tilesetfile = 'images/alive-tileset.png'
-        self.tsp = TilesetParser(
+        self.tsp = self.tilesets.get(
                                 tilesetfile,
                                 (self.tile_w, self.tile_h),
                                 color.magenta
@@ -895,13 +1308,14 @@ class GraphicalView(object):
         # grab our sprite
         sprite = self.sprites.get(id(obj), None)
         if not sprite:
-            trace.write('%s has no matching sprite object.' % obj.name)
+            trace.warning('ui', '%s has no matching sprite object.', obj.name)
             return
 
         # apply animation defs
         if anims:
             obj.frames = map(int, anims['frames'])
-            obj.fps = anims.as_float('fps') + round(random.random() - 0.5, 1)
+            obj.fps = anims.as_float('fps') + round(
+                self.random.random() - 0.5, 1)
             obj.loop = anims.as_int('loop')
 
         # ensure at least 1 frame
@@ -1009,9 +1423,17 @@ class GraphicalView(object):
 
         sprite = self.sprites.get(id(event.obj), None)
         if sprite:
-            sprite.set_position(event.obj.x * self.tile_w,
-                                event.obj.y * self.tile_h,
-                                8)
+            x = event.obj.x * self.tile_w
+            y = event.obj.y * self.tile_h
+            # sprites far from the viewport are not updated, so they
+            # jump to their destination instead of shifting there.
+            nearby = self.viewport.inflate(
+                VIEWPORT_MARGIN_TILES * self.tile_w * 2,
+                VIEWPORT_MARGIN_TILES * self.tile_h * 2)
+            if nearby.colliderect(sprite.rect) or nearby.collidepoint(x, y):
+                sprite.set_position(x, y, 8)
+            else:
+                sprite.set_position(x, y)
             return
 
     def kill_sprite(self, obj):
@@ -1132,7 +1554,9 @@ class GraphicalView(object):
             self.clock = pygame.time.Clock()
             pygame.display.set_caption('Alive')
             pygame.mouse.set_visible(False)
-            self.screen = pygame.display.set_mode(self.windowsize.size)
+            # ask for true color, headless video drivers default to a palette
+            self.screen = pygame.display.set_mode(
+                                    self.windowsize.size, 0, 32)
 
             # flag that we are done and ready for drawing action
             self.isinitialized = True
@@ -1620,7 +2044,7 @@ class GraphicalView(object):
 
         """
 
-        trace.write('pressed button %s' % ux.code)
+        trace.debug('ui', 'pressed button %s', ux.code)
         tab_states = [STATE_INFO_HOME, STATE_INFO_UPGRADES, STATE_INFO_WINS]
 
         if context == STATE_PLAY:
@@ -1646,20 +2070,20 @@ class GraphicalView(object):
         elif context == STATE_MENU_SAVED:
             if ux.code.startswith('load game'):
                 self.model.game_slot = int(ux.code.split()[-1])
-                trace.write('save game slot %s selected' %
+                trace.info('ui', 'save game slot %s selected',
                     self.model.game_slot)
                 self.post(StateChangeEvent(None))
                 self.model.begin_game()
             elif ux.code.startswith('new game'):
                 self.model.game_slot = int(ux.code.split()[-1])
-                trace.write('save game slot %s selected' %
+                trace.info('ui', 'save game slot %s selected',
                     self.model.game_slot)
                 self.post(StateChangeEvent(STATE_MENU_STORIES))
 
         elif context == STATE_MENU_STORIES:
             if ux.code.startswith('story'):
                 self.model.story_name = ux.data
-                trace.write('selected story "%s"' % (self.model.story_name))
+                trace.info('ui', 'selected story "%s"', self.model.story_name)
                 self.post(StateChangeEvent(None))
                 self.post(StateChangeEvent(None))
                 self.model.begin_game()
@@ -1762,3 +2186,6 @@ UG_PING_SRC = (0, 315, 57, 45)
 UG_FORK_SRC = (0, 360, 57, 45)
 UG_EXPLOIT_SRC = (0, 405, 57, 45)
 UG_DEREZ_SRC = (0, 450,  57, 45)
+
+# pygame event that wakes us from waiting on input to play animations
+RENDER_WAKE_EVENT = pygame.USEREVENT + 1
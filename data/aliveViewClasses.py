@@ -50,6 +50,17 @@ class Sprite(pygame.sprite.Sprite):
         if self.shift_speed and self.destination:
             return self.rect.topleft != self.destination
 
+    def next_update(self, t):
+        """
+        Returns the milliseconds until this sprite changes, 0 if it is
+        busy moving, or None if it has no animation to play.
+        """
+
+        if self.is_moving:
+            return 0
+        if self._hasframes and len(self._images) > 1:
+            return max(0, int(self._delay - (t - self._last_update)) + 1)
+
     def addimage(self, image, fps, loop):
         """
         Allows adding of a animated sprite image.
@@ -492,6 +503,8 @@ class GraphDisplay(object):
         self.lasttime = 0
         # the actual graph values
         self.poly_points = None
+        # the values changed since we last drew the graph
+        self.dirty = False
         # the graph fill color is a darker base color
         self.fill_color = pygame.Color(*self.base_color)
         hsva = self.fill_color.hsva
@@ -544,6 +557,7 @@ class GraphDisplay(object):
             self.poly_points.append((int(px), int(py)))
         # to align the start and end points for nice closure
         self.poly_points.append((width, height))
+        self.dirty = True
 
     def can_update(self, time):
         """
@@ -555,13 +569,26 @@ class GraphDisplay(object):
             self.lasttime = time
             return True
 
+    def next_update(self, time):
+        """
+        Returns the milliseconds until the graph is drawn again, 0 if it
+        can be drawn now, or None if its values did not change.
+
+        """
+
+        if self.dirty and self.poly_points:
+            return max(0, self.delay - (time - self.lasttime) + 1)
+
     def update(self, time):
         """
-        Draw the image if the fps allows us.
+        Draw the image if the values changed and the fps allows us.
+        Returns True if the image was drawn.
 
         """
 
-        if self.can_update(time) and self.poly_points:
+        # only spend the frame slot when there is something to draw
+        if self.dirty and self.poly_points and self.can_update(time):
+            self.dirty = False
             # draw the graph
             self.image.fill(color.black)
             # draw graph outline
@@ -572,6 +599,7 @@ class GraphDisplay(object):
                 self.image, self.fill_color, self.poly_points, 0)
             pygame.draw.rect(self.image, self.base_color,
                 pygame.Rect((0, 0), self.rect.size), 1)
+            return True
 
     def draw(self, surface):
         """
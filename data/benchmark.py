@@ -0,0 +1,275 @@
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see http://www.gnu.org/licenses/.
+
+# Measures how fast the game model plays turns, without a display.
+#
+#   python benchmark.py [turns] [seed] [results file]
+#
+# plays the same seeded moves and upgrades on every map of the story,
+# on scaled up copies of them and on the synthetic mapgen fixtures, and
+# writes the turns per second and the time spent in each phase of a turn
+# as JSON. Diff the results files of two versions to compare them.
+
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import random
+import shutil
+import tempfile
+import numpy
+from xml.etree import ElementTree
+import trace
+import mapgen
+import headless
+import eventmanager
+import aliveModel
+import aliveUpgrades as alu
+
+STORY_NAME = 'ascension'
+
+# game model methods timed within each turn
+PHASES = [
+    'process_interaction_queue',
+    'heal_turn',
+    'ai_movement_turn',
+    'look_around',
+    'look_at_target',
+    ]
+
+# each map is also played scaled up by these factors per side
+SCALES = [1, 3]
+
+# upgrades installed for the player to use
+UPGRADES = [alu.ZAP, alu.CODE_FREEZE, alu.PING_FLOOD, alu.FORK_BOMB]
+
+# one in this many turns the player also uses an upgrade
+UPGRADE_EVERY = 8
+
+RESULTS_FILE = 'benchmark.json'
+
+
+class PhaseTimer(object):
+    """
+    Times the calls to some methods of an object, by replacing them on
+    the instance with timed versions.
+    """
+
+    def __init__(self, obj, names):
+        """
+        Attributes:
+
+        phases (dict): method name to [calls, total seconds].
+        """
+
+        self.phases = {}
+        for name in names:
+            self.phases[name] = [0, 0.0]
+            setattr(obj, name, self.timed(getattr(obj, name), name))
+
+    def timed(self, method, name):
+        """
+        Returns method wrapped to add its wall time to the named phase.
+        """
+
+        stat = self.phases[name]
+        def call(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stat[0] += 1
+                stat[1] += time.time() - start
+        return call
+
+    def reset(self):
+        """
+        Forget all recorded times.
+        """
+
+        for stat in self.phases.values():
+            stat[:] = [0, 0.0]
+
+    def as_dict(self):
+        """
+        Returns the recorded times as a dict of plain values.
+        """
+
+        phases = {}
+        for name, (calls, total) in self.phases.items():
+            phases[name] = {
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': calls and round(total * 1000 / calls, 4) or 0,
+                }
+        return phases
+
+
+def benchmark_script(turns, seed):
+    """
+    Returns a script of random moves for headless.ScriptedInput, with the
+    player targeting and using an upgrade every now and then.
+    The same seed returns the same script.
+    """
+
+    rand = random.Random(seed)
+    directions = sorted(headless.DIRECTIONS.values())
+    script = []
+    for n in range(turns):
+        if rand.randrange(UPGRADE_EVERY) == 0:
+            script.append(('target',))
+            script.append(('upgrade', rand.choice(UPGRADES)))
+        script.append(('move', rand.choice(directions)))
+    return script
+
+
+def scale_map(filename, scale, path):
+    """
+    Write a copy of a tmx map to path, repeated scale times across and
+    down. Objects are repeated with the map, except the player.
+    """
+
+    tree = ElementTree.parse(filename)
+    root = tree.getroot()
+    width = int(root.attrib['width'])
+    height = int(root.attrib['height'])
+    px_width = width * int(root.attrib['tilewidth'])
+    px_height = height * int(root.attrib['tileheight'])
+    root.set('width', str(width * scale))
+    root.set('height', str(height * scale))
+
+    for layer in root.findall('layer'):
+        data = layer.find('data')
+        gids = numpy.frombuffer(
+            data.text.strip().decode('base64').decode('zlib'),
+            dtype='<i4').reshape((height, width))
+        data.text = mapgen.encode_gids(numpy.tile(gids, (scale, scale)))
+        layer.set('width', str(width * scale))
+        layer.set('height', str(height * scale))
+
+    for group in root.findall('objectgroup'):
+        group.set('width', str(width * scale))
+        group.set('height', str(height * scale))
+        originals = [tag for tag in group.findall('object')
+                        if tag.attrib.get('type', '').lower() != 'player']
+        for y in range(scale):
+            for x in range(scale):
+                if not x and not y:
+                    continue
+                for tag in originals:
+                    tag = copy.deepcopy(tag)
+                    tag.set('x', str(int(tag.attrib['x']) + x * px_width))
+                    tag.set('y', str(int(tag.attrib['y']) + y * px_height))
+                    group.append(tag)
+
+    tree.write(path)
+
+
+def play_level(filename, turns, seed, story_name=STORY_NAME):
+    """
+    Play the benchmark script on a map, and return its results as a dict.
+    """
+
+    evManager = eventmanager.EventManager(queued=True)
+    model = aliveModel.GameEngine(evManager)
+    model.story_name = story_name
+    model.game_slot = 0
+    model.begin_game(seed)
+    # the player keeps the upgrades over level restarts
+    # if we install them before we warp there.
+    for name in UPGRADES:
+        model.install_upgrade(name)
+    number = model.story.level_number(os.path.basename(filename))
+    if number:
+        model.level_number = number
+    model.warp_level(restart=True, level_filename=filename)
+
+    player = headless.ScriptedInput(
+        evManager, model, benchmark_script(turns, seed))
+    player.settle()
+    timer = PhaseTimer(model, PHASES)
+    first_turn = model.turn
+    start = time.time()
+    player.play()
+    seconds = time.time() - start
+    played = model.turn - first_turn
+
+    return {
+        'width': model.level.tmx.width,
+        'height': model.level.tmx.height,
+        'objects': len(model.objects),
+        'turns': played,
+        'restarts': player.restarts,
+        'seconds': round(seconds, 3),
+        'turns_per_second': seconds and round(played / seconds, 1) or 0,
+        'phases': timer.as_dict(),
+        }
+
+
+def run(turns=500, seed=1, scales=SCALES, story_name=STORY_NAME,
+        fixtures=sorted(mapgen.FIXTURES)):
+    """
+    Play the benchmark on every map of the story at every scale, and on
+    the named mapgen fixtures. Returns the results as a dict.
+    """
+
+    # switch to this path to point relative paths to resources
+    os.chdir(os.path.dirname(os.path.realpath(__file__)))
+    maps = sorted(glob.glob(os.path.join('stories', story_name, '*.tmx')))
+    results = {
+        'turns': turns,
+        'seed': seed,
+        'python': sys.version.split()[0],
+        'levels': {},
+        }
+    # where we write the maps we make
+    map_path = tempfile.mkdtemp()
+    try:
+        for filename in maps:
+            for scale in scales:
+                level_filename = filename
+                if scale > 1:
+                    level_filename = os.path.join(map_path,
+                                        os.path.basename(filename))
+                    scale_map(filename, scale, level_filename)
+                key = '%s x%s' % (os.path.basename(filename), scale)
+                results['levels'][key] = play_level(
+                                        level_filename, turns, seed,
+                                        story_name)
+        for name in fixtures:
+            level_filename = mapgen.fixture(name,
+                            os.path.join(map_path, name + '.tmx'), seed)
+            results['levels']['%s fixture' % (name,)] = play_level(
+                                        level_filename, turns, seed,
+                                        story_name)
+    finally:
+        shutil.rmtree(map_path)
+    return results
+
+
+if __name__ == '__main__':
+    turns = len(sys.argv) > 1 and int(sys.argv[1]) or 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    results_file = len(sys.argv) > 3 and sys.argv[3] or RESULTS_FILE
+    results_file = os.path.abspath(results_file)
+    trace.LEVEL = trace.WARNING
+    results = run(turns, seed)
+    with open(results_file, 'wt') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for key, level in sorted(results['levels'].items()):
+        print('%-28s %4sx%-4s %5s objects %8s turns/sec' % (key,
+            level['width'], level['height'], level['objects'],
+            level['turns_per_second']))
+    print('wrote %s' % (results_file,))
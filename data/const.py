@@ -14,6 +14,17 @@
 # Frames per second
 FPS = 30
 
+# only redraw the screen when something animates or the game changes,
+# and sleep until input arrives otherwise.
+RENDER_ON_CHANGE = True
+
+# flip the whole display instead of updating changed areas when those
+# cover more than this fraction of the window.
+FULL_FLIP_RATIO = 0.9
+
+# where event manager stats are written to
+EVENT_STATS_FILE = 'event-stats.json'
+
 # state machine constants
 STATE_INTRO = 10
 STATE_MENU_MAIN = 20
@@ -36,6 +47,12 @@ FOG_GID = 34
 # tile id of unseen tiles
 UNSEEN_GID = 51
 
+# map tiles are pre-rendered in square chunks of this many tiles
+MAP_CHUNK_TILES = 16
+
+# sprites this many tiles outside the viewport still animate and shift
+VIEWPORT_MARGIN_TILES = 2
+
 # number of player positions to keep as a scent.
 PLAYER_SCENT_LEN = 5
 
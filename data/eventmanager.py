@@ -11,7 +11,10 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program. If not, see http://www.gnu.org/licenses/.
 
+import json
+import time
 import trace
+from collections import deque
 
 
 class Event(object):
@@ -284,21 +287,155 @@ class DebugEvent(Event):
         return 'debug command: ' + self.request_type
 
 
+# in queued mode these events are still delivered the moment they are
+# posted, right after the events queued before them: game rules rely on
+# their effects being immediate, and crash handling needs the exception
+# that is being handled.
+IMMEDIATE_EVENTS = (
+    QuitEvent,
+    InitializeEvent,
+    NextLevelEvent,
+    StateChangeEvent,
+    StateSwapEvent,
+    CombatEvent,
+    KillCharacterEvent,
+    CrashEvent,
+    )
+
+# the most queued events delivered by one Pump() call
+PUMP_LIMIT = 500
+
+# record event counts and handler times. costs one test per event if off.
+INSTRUMENT = False
+
+
+class EventStats(object):
+    """
+    Records how many times each listener handled each event class,
+    and how long it took, as a histogram of handler wall times in
+    power of two microsecond buckets.
+    Handler times include any events they deliver in turn.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        # {event class name: {listener name: [count, total, max, buckets]}}
+        self.events = {}
+
+    def deliver(self, routes, event):
+        """
+        Call the (listener, handler) routes with event, timing each one.
+        """
+
+        listeners = self.events.setdefault(type(event).__name__, {})
+        for listener, handler in routes:
+            start = time.time()
+            try:
+                handler(event)
+            finally:
+                elapsed = time.time() - start
+                name = type(listener).__name__
+                stat = listeners.get(name)
+                if stat is None:
+                    stat = listeners[name] = [0, 0.0, 0.0, {}]
+                stat[0] += 1
+                stat[1] += elapsed
+                stat[2] = max(stat[2], elapsed)
+                # bucket n holds times under 2**n microseconds
+                bucket = int(elapsed * 1000000).bit_length()
+                stat[3][bucket] = stat[3].get(bucket, 0) + 1
+
+    def as_dict(self):
+        """
+        Returns the recorded stats as a dict of plain values.
+        """
+
+        events = {}
+        for event_name, listeners in self.events.items():
+            events[event_name] = {}
+            for name, (count, total, longest, buckets) in listeners.items():
+                events[event_name][name] = {
+                    'count': count,
+                    'total_ms': round(total * 1000, 3),
+                    'mean_ms': round(total * 1000 / count, 3),
+                    'max_ms': round(longest * 1000, 3),
+                    # [under this many microseconds, count] pairs
+                    'histogram_us': [
+                        [2 ** b, n] for b, n in sorted(buckets.items())],
+                    }
+        return {
+            'seconds': round(time.time() - self.started, 3),
+            'events': events,
+            }
+
+    def dump(self, filename):
+        """
+        Write the recorded stats to a JSON file.
+        """
+
+        stats = open(filename, 'wt')
+        json.dump(self.as_dict(), stats, indent=2, sort_keys=True)
+        stats.close()
+        trace.info('event', 'wrote event stats to %s', filename)
+
+
 class EventManager(object):
     """
     We coordinate communication between the Model, View, and Controller.
+
+    Listeners register a handler per event class they care about.
+    An event goes to the handler of its own class, or else to the handler
+    of its nearest base class, so a listener that handles Event hears
+    everything. Handlers are called in the order listeners registered.
+
+    By default events are delivered as they are Post()ed, so handlers
+    posting more events deliver those inside their own call.
+    In queued mode events are appended to a queue instead, which the game
+    loop delivers in order with Pump(). Events of the immediate classes
+    are still delivered as they are posted, after the queued events that
+    were posted before them, so listeners always hear events in the order
+    they were posted.
     """
 
-    def __init__(self):
+    def __init__(self, queued=False, immediate=IMMEDIATE_EVENTS,
+                pump_limit=PUMP_LIMIT, instrument=INSTRUMENT):
         self.listeners = []
+        # handlers by listener, each a dict of event class: handler
+        self.handlers = {}
+        # lists of (listener, handler) to call by event class,
+        # built on first use
+        self.routes = {}
+        # an EventStats if we are instrumented
+        self.stats = instrument and EventStats() or None
+        self.queued = queued
+        self.immediate = tuple(immediate)
+        self.pump_limit = pump_limit
+        # (sequence, event) in the order they were posted
+        self.queue = deque()
+        self.sequence = 0
+
+    @property
+    def pending(self):
+        """
+        The number of queued events waiting for delivery.
+        """
+
+        return len(self.queue)
 
-    def RegisterListener(self, listener):
+    def RegisterListener(self, listener, handlers=None):
         """
         Adds a listener to our spam list.
-        It will receive Post()ed events through it's notify(event) call.
+        handlers is a dict of event classes to the callables that handle
+        them. Without handlers, the listener will receive all Post()ed
+        events through it's notify(event) call.
         """
 
-        self.listeners.append(listener)
+        if handlers is None:
+            handlers = {Event: listener.notify}
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+        self.handlers[id(listener)] = dict(handlers)
+        self.routes = {}
 
     def UnregisterListener(self, listener):
         """
@@ -310,14 +447,102 @@ class EventManager(object):
 
         if listener in self.listeners:
             self.listeners.remove(listener)
+            del self.handlers[id(listener)]
+            self.routes = {}
+
+    def route(self, event_class):
+        """
+        Returns the list of (listener, handler) for an event class.
+        """
+
+        routes = []
+        for listener in self.listeners:
+            listener_handlers = self.handlers[id(listener)]
+            for base in event_class.__mro__:
+                if base in listener_handlers:
+                    routes.append((listener, listener_handlers[base]))
+                    break
+        self.routes[event_class] = routes
+        return routes
 
     def Post(self, event):
         """
         Post a new event to the message queue.
-        It will be broadcast to all listeners.
+        It will be broadcast to all listeners who handle it, right away
+        or on the next Pump() if we are queued.
         """
 
-        if type(event) not in (TickEvent, InputEvent):
-            trace.write(str(event))
-        for listener in self.listeners:
-            listener.notify(event)
+        if not self.queued:
+            self.Deliver(event)
+        elif isinstance(event, self.immediate):
+            self.Flush(self.sequence)
+            self.Deliver(event)
+        else:
+            self.sequence += 1
+            self.queue.append((self.sequence, event))
+
+    def Flush(self, sequence):
+        """
+        Deliver the queued events posted up to and including the given
+        sequence number, no matter the pump_limit.
+        Events they post in turn stay queued.
+        """
+
+        queue = self.queue
+        while queue and queue[0][0] <= sequence:
+            self.Deliver(queue.popleft()[1])
+
+    def Pump(self):
+        """
+        Deliver queued events in the order they were posted, including
+        events posted while we pump, up to pump_limit events.
+        Anything left waits for the next call.
+        Returns the number of events delivered.
+        """
+
+        delivered = 0
+        while self.queue and delivered < self.pump_limit:
+            self.Deliver(self.queue.popleft()[1])
+            delivered += 1
+        return delivered
+
+    def Deliver(self, event):
+        """
+        Broadcast an event to all listeners who handle it.
+        """
+
+        event_class = type(event)
+        if event_class not in (TickEvent, InputEvent):
+            trace.debug('event', '%s', event)
+        routes = self.routes.get(event_class)
+        if routes is None:
+            routes = self.route(event_class)
+        if self.stats is None:
+            for listener, handler in routes:
+                handler(event)
+        else:
+            self.stats.deliver(routes, event)
+
+
+if __name__ == '__main__':
+
+    def test_queued_order():
+        class Listener(object):
+            def __init__(self, evManager):
+                self.heard = []
+                evManager.RegisterListener(self)
+            def notify(self, event):
+                self.heard.append(event)
+
+        evManager = EventManager(queued=True)
+        listener = Listener(evManager)
+        events = [TickEvent(), StateChangeEvent(None), TickEvent()]
+        for event in events:
+            evManager.Post(event)
+        # the state change brings the tick posted before it along
+        assert listener.heard == events[:2], listener.heard
+        evManager.Pump()
+        assert listener.heard == events, listener.heard
+        print('queued events are delivered in the order they were posted')
+
+    test_queued_order()
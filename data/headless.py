@@ -0,0 +1,197 @@
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see http://www.gnu.org/licenses/.
+
+# Runs the game model without a display, sound or pygame,
+# played by a script instead of the keyboard.
+#
+#   python headless.py [turns] [seed] [map file or mapgen fixture name]
+#
+# plays the given number of random moves and prints where the player got to.
+# the same seed plays the same game.
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import mapgen
+import eventmanager
+import aliveModel
+from const import *
+from eventmanager import *
+
+# player moves by direction name
+DIRECTIONS = {
+    'left': (-1, +0),
+    'right': (+1, +0),
+    'down': (+0, +1),
+    'up': (+0, -1),
+    'up left': (-1, -1),
+    'up right': (+1, -1),
+    'down left': (-1, +1),
+    'down right': (+1, +1),
+    }
+
+
+class ScriptedInput(object):
+    """
+    Plays a script against the game model, in the place of the keyboard
+    controller and the view.
+
+    A script is any iterable of commands. Each command is a tuple of the
+    command name followed by its arguments:
+
+        ('move', (x, y))        move the player by this offset.
+        ('target',)             target the next object in range.
+        ('install', name)       install or upgrade an upgrade.
+        ('upgrade', name)       use an installed upgrade.
+        ('warp',)               warp to the next level, if allowed.
+
+    After each command the game settles: queued events are delivered,
+    delayed events come due at once, dialogues are closed and failed
+    levels are restarted.
+    """
+
+    def __init__(self, evManager, model, script):
+        """
+        Attributes:
+
+        commands (int): the number of commands played.
+        restarts (int): the number of failed levels we restarted.
+        """
+
+        self.evManager = evManager
+        self.model = model
+        self.script = iter(script)
+        self.commands = 0
+        self.restarts = 0
+
+    def step(self):
+        """
+        Play the next command in the script.
+        Returns False when the script is done.
+        """
+
+        try:
+            command = next(self.script)
+        except StopIteration:
+            return False
+
+        name = command[0]
+        args = command[1:]
+        if name == 'move':
+            self.model.move_player(args[0])
+        elif name == 'target':
+            self.model.target_next()
+        elif name == 'install':
+            self.model.install_upgrade(args[0])
+        elif name == 'upgrade':
+            self.model.use_upgrade(args[0])
+        elif name == 'warp':
+            self.model.warp_level()
+        else:
+            raise ValueError('unknown script command "%s"' % (name,))
+        self.commands += 1
+        self.settle()
+        return True
+
+    def play(self):
+        """
+        Play the entire script.
+        """
+
+        while self.step():
+            pass
+
+    def settle(self):
+        """
+        Deliver all pending events, and get past any screens that would
+        wait for a key press.
+        """
+
+        model = self.model
+        while True:
+            self.evManager.Pump()
+            if self.evManager.pending:
+                continue
+            # nobody is watching the animations delayed events wait for
+            if model.frame_timer:
+                for event in model.frame_timer.advance(FPS):
+                    model.post(event)
+                continue
+            state = model.state.peek()
+            if state in (STATE_DIALOG, STATE_HELP):
+                model.post(StateChangeEvent(None))
+            elif state == STATE_LEVEL_FAIL:
+                model.post(StateChangeEvent(None))
+                model.restart_level()
+                self.restarts += 1
+            else:
+                break
+
+
+def random_script(turns, seed=None):
+    """
+    Returns a script of random player moves.
+    The same seed returns the same moves.
+    """
+
+    rand = random.Random(seed)
+    directions = sorted(DIRECTIONS.values())
+    return [('move', rand.choice(directions)) for n in range(turns)]
+
+
+def run(script, seed=None, story_name=None, game_slot=0, queued=True,
+        level_filename=None):
+    """
+    Start a game and play the script on it. No display is used.
+    The same script and seed play the same game.
+    A game_slot of 0 does not load or save a game.
+    level_filename plays that map instead of the story's first level.
+    Returns the ScriptedInput, whose model attribute holds the game.
+    """
+
+    # switch to this path to point relative paths to resources
+    os.chdir(os.path.dirname(os.path.realpath(__file__)))
+    evManager = eventmanager.EventManager(queued=queued)
+    model = aliveModel.GameEngine(evManager)
+    player = ScriptedInput(evManager, model, script)
+    if story_name:
+        model.story_name = story_name
+    model.game_slot = game_slot
+    model.begin_game(seed)
+    if level_filename:
+        model.warp_level(restart=True, level_filename=level_filename)
+    player.settle()
+    player.play()
+    return player
+
+
+if __name__ == '__main__':
+    turns = len(sys.argv) > 1 and int(sys.argv[1]) or 100
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    map_name = len(sys.argv) > 3 and sys.argv[3] or None
+    level_filename = map_name and os.path.abspath(map_name)
+    map_path = tempfile.mkdtemp()
+    try:
+        if map_name in mapgen.FIXTURES:
+            level_filename = mapgen.fixture(map_name,
+                os.path.join(map_path, map_name + '.tmx'), seed)
+        player = run(random_script(turns, seed), seed,
+                     level_filename=level_filename)
+    finally:
+        shutil.rmtree(map_path)
+    model = player.model
+    print('played %s commands with seed %s, at turn %s on level %s at %s, '
+          '%s level restarts' % (player.commands, model.seed, model.turn,
+          model.level_number, model.player.getxy(), player.restarts))
@@ -0,0 +1,246 @@
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see http://www.gnu.org/licenses/.
+
+# Writes synthetic tmx maps to stress test the game with: as large as
+# we like, with crowds of characters and triggers.
+#
+#   python mapgen.py [fixture name] [map file]
+#
+# writes one of the FIXTURES maps. The benchmarks play these fixtures
+# next to the story maps, and headless.py can play them too.
+
+import sys
+import random
+import numpy
+from xml.etree import ElementTree
+
+TILE_SIZE = 32
+
+# tileset gids we build maps from
+FLOOR_GID = 86
+WALL_GID = 53
+PLAYER_GID = 393
+
+# a gid for each character of the story
+CHARACTER_GIDS = {
+    'blue ice': 427,
+    'green ice': 461,
+    'sick green ice': 479,
+    'green virus': 495,
+    'black skull': 529,
+    }
+
+# trigger area tiles per side
+TRIGGER_SIZE = 3
+
+# trigger properties we cycle through, as (name, value) pairs.
+# %(n)s is replaced with the trigger number.
+TRIGGERS = [
+    [('notify', '@repeat @message you cross synthetic trigger %(n)s')],
+    [('rouse', '@repeat @setattr type_filter=ai modes=random')],
+    [('calm', '@repeat @setattr type_filter=ai modes=updown speed=2')],
+    [('count', '@repeat @addcounter'),
+     ('reset', '@repeat @ifcounter=3 @clearcounter'),
+     ('report', '@repeat @ifcounter=3 @message trigger %(n)s reset')],
+    ]
+
+# named maps for the benchmarks and headless runs
+FIXTURES = {
+    # a small map packed with characters
+    'crowd': {
+        'width': 40,
+        'height': 40,
+        'wall_density': 0.1,
+        'ai_count': 150,
+        'friend_count': 50,
+        'ai_modes': ['random'],
+        'trigger_count': 12,
+        },
+    # a large map of roaming characters, mostly far from the player
+    'large': {
+        'width': 160,
+        'height': 160,
+        'wall_density': 0.2,
+        'ai_count': 400,
+        'friend_count': 100,
+        'ai_modes': ['random', 'updown'],
+        'friend_modes': ['leftright'],
+        'trigger_count': 60,
+        },
+    # the large map, with characters sleeping away from the player
+    'dormant': {
+        'width': 160,
+        'height': 160,
+        'wall_density': 0.2,
+        'ai_count': 400,
+        'friend_count': 100,
+        'ai_modes': ['random', 'updown'],
+        'friend_modes': ['leftright'],
+        'activation_radius': 12,
+        'trigger_count': 60,
+        },
+    # a large map of slow characters that mostly stand still
+    'sleepy': {
+        'width': 120,
+        'height': 120,
+        'wall_density': 0.15,
+        'ai_count': 600,
+        'ai_name': 'sick green ice',
+        'ai_speed': 12,
+        'trigger_count': 20,
+        },
+    }
+
+
+def encode_gids(gids):
+    """
+    Returns a numpy array of gids indexed as [y, x] as tmx layer data:
+    little endian 32 bit integers, zlib compressed and base64 encoded.
+    """
+
+    data = numpy.asarray(gids, dtype='<i4').tostring()
+    return data.encode('zlib').encode('base64')
+
+
+def add_object(group, name, obj_type, gid, x, y, properties=None,
+                width=None, height=None):
+    """
+    Add a map object at tile (x, y) to an objectgroup element.
+    properties is a list of (name, value) pairs.
+    Objects without a gid are areas of width by height tiles.
+    """
+
+    tag = ElementTree.SubElement(group, 'object')
+    if name:
+        tag.set('name', name)
+    if obj_type:
+        tag.set('type', obj_type)
+    tag.set('x', str(x * TILE_SIZE))
+    if gid > -1:
+        tag.set('gid', str(gid))
+        # tiled places tile objects by their bottom edge
+        tag.set('y', str((y + 1) * TILE_SIZE))
+    else:
+        tag.set('y', str(y * TILE_SIZE))
+        tag.set('width', str(width * TILE_SIZE))
+        tag.set('height', str(height * TILE_SIZE))
+    if properties:
+        props = ElementTree.SubElement(tag, 'properties')
+        for key, value in properties:
+            ElementTree.SubElement(props, 'property',
+                                    name=key, value=value)
+    return tag
+
+
+def generate(filename, width=64, height=64, wall_density=0.2,
+            ai_count=50, friend_count=0,
+            ai_name='green ice', friend_name='blue ice',
+            ai_modes=None, friend_modes=None,
+            ai_speed=None, friend_speed=None,
+            activation_radius=None, trigger_count=0, seed=1):
+    """
+    Write a synthetic tmx map to filename.
+
+    The map is walled in, with random walls inside it covering about
+    wall_density of the floor. The player starts in the middle.
+    ai_count 'ai' and friend_count 'friend' characters are spread over
+    the open floor, named after story characters so they get their stats.
+    Their modes default to those in the story config, unless ai_modes or
+    friend_modes give a list of modes to use, and so do their speeds
+    unless ai_speed or friend_speed give the turns between their moves.
+    activation_radius sets how near the player they wake up.
+    trigger_count trigger areas cycle through the TRIGGERS.
+    The same seed writes the same map.
+    """
+
+    rand = random.Random(seed)
+    root = ElementTree.Element('map', version='1.0',
+                orientation='orthogonal',
+                width=str(width), height=str(height),
+                tilewidth=str(TILE_SIZE), tileheight=str(TILE_SIZE))
+    tileset = ElementTree.SubElement(root, 'tileset', firstgid='1',
+                name='alive-tileset',
+                tilewidth=str(TILE_SIZE), tileheight=str(TILE_SIZE))
+    ElementTree.SubElement(tileset, 'image', source='alive-tileset.png',
+                trans='ff00ff', width='544', height='1344')
+
+    # walls all round, random walls within, clear around the player.
+    walls = numpy.zeros((height, width), dtype=bool)
+    walls[1:-1, 1:-1] = [[rand.random() < wall_density
+                            for x in range(width - 2)]
+                            for y in range(height - 2)]
+    walls[0, :] = walls[-1, :] = True
+    walls[:, 0] = walls[:, -1] = True
+    player_x, player_y = width / 2, height / 2
+    walls[player_y - 1:player_y + 2, player_x - 1:player_x + 2] = False
+
+    for name, gids in (
+            ('Floor', numpy.where(walls, 0, FLOOR_GID)),
+            ('Walls', numpy.where(walls, WALL_GID, 0))):
+        layer = ElementTree.SubElement(root, 'layer',
+                    name=name, width=str(width), height=str(height))
+        data = ElementTree.SubElement(layer, 'data',
+                    encoding='base64', compression='zlib')
+        data.text = encode_gids(gids)
+
+    group = ElementTree.SubElement(root, 'objectgroup', name='objects',
+                width=str(width), height=str(height))
+    add_object(group, 'player', 'player', PLAYER_GID, player_x, player_y)
+
+    # characters take free floor tiles, away from the player
+    floor = [(x, y) for y in range(height) for x in range(width)
+                if not walls[y, x] and
+                max(abs(x - player_x), abs(y - player_y)) > 1]
+    rand.shuffle(floor)
+    for obj_type, count, name, modes, speed in (
+            ('ai', ai_count, ai_name, ai_modes, ai_speed),
+            ('friend', friend_count, friend_name, friend_modes,
+                friend_speed)):
+        properties = []
+        if modes:
+            properties.append(('modes', ', '.join(modes)))
+        if speed:
+            properties.append(('speed', str(speed)))
+        if activation_radius:
+            properties.append(
+                ('activation_radius', str(activation_radius)))
+        for n in range(min(count, len(floor))):
+            x, y = floor.pop()
+            add_object(group, name, obj_type, CHARACTER_GIDS[name],
+                        x, y, properties)
+
+    for n in range(trigger_count):
+        x = rand.randint(1, max(1, width - TRIGGER_SIZE - 1))
+        y = rand.randint(1, max(1, height - TRIGGER_SIZE - 1))
+        properties = [(key, value % {'n': n})
+                        for key, value in TRIGGERS[n % len(TRIGGERS)]]
+        add_object(group, 'trigger %s' % (n,), '', -1, x, y, properties,
+                    TRIGGER_SIZE, TRIGGER_SIZE)
+
+    ElementTree.ElementTree(root).write(filename, 'UTF-8')
+    return filename
+
+
+def fixture(name, filename, seed=1):
+    """
+    Write the named FIXTURES map to filename.
+    """
+
+    return generate(filename, seed=seed, **FIXTURES[name])
+
+
+if __name__ == '__main__':
+    name = len(sys.argv) > 1 and sys.argv[1] or 'crowd'
+    filename = len(sys.argv) > 2 and sys.argv[2] or '%s.tmx' % (name,)
+    fixture(name, filename)
+    print('wrote the %s map to %s' % (name, filename))
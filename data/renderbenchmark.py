@@ -0,0 +1,206 @@
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see http://www.gnu.org/licenses/.
+
+# Measures how long the view takes to draw a frame, without a monitor.
+#
+#   python renderbenchmark.py [frames] [results file]
+#
+# draws every map of the story and the synthetic mapgen fixtures with
+# SDL's dummy video driver: idle, with many floating tips and with a warp
+# transition playing. It writes the
+# frames per second, frame time percentiles and the time spent in each
+# part of a frame as JSON.
+
+import os
+# draw to memory instead of a window, and play no sound
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import sys
+import glob
+import json
+import time
+import shutil
+import tempfile
+import numpy
+import trace
+import color
+import mapgen
+import headless
+import benchmark
+import eventmanager
+import aliveModel
+import aliveView
+from const import *
+from eventmanager import *
+
+# view methods timed within each frame
+PHASES = [
+    'draw_borders',
+    'draw_graphs',
+    'draw_sprites',
+    'draw_fog',
+    'draw_target',
+    'draw_scroller_text',
+    'draw_transition',
+    'update_display',
+    ]
+
+# the number of floating tips kept on screen in the tips frames
+TIP_COUNT = 40
+
+RESULTS_FILE = 'render-benchmark.json'
+
+
+class RenderBench(object):
+    """
+    Draws frames of a headless game and times them.
+    """
+
+    def __init__(self, seed, story_name=benchmark.STORY_NAME):
+        """
+        Attributes:
+
+        evManager (EventManager): delivers events between model and view.
+        model (GameEngine): the game we draw.
+        view (GraphicalView): draws the game on the dummy display.
+        phases (PhaseTimer): times the view's drawing methods.
+        ui_phases (PhaseTimer): times the ui manager's update.
+        """
+
+        self.evManager = eventmanager.EventManager(queued=True)
+        self.model = aliveModel.GameEngine(self.evManager)
+        self.view = aliveView.GraphicalView(self.evManager, self.model)
+        self.model.post(InitializeEvent())
+        self.model.post(StateChangeEvent(STATE_MENU_MAIN))
+        self.model.story_name = story_name
+        self.model.game_slot = 0
+        self.model.begin_game(seed)
+        self.settle()
+        self.phases = benchmark.PhaseTimer(self.view, PHASES)
+        self.ui_phases = benchmark.PhaseTimer(self.view.ui, ['update'])
+
+    def settle(self):
+        """
+        Deliver pending events and close any dialogues.
+        """
+
+        headless.ScriptedInput(self.evManager, self.model, []).settle()
+
+    def load_map(self, filename):
+        """
+        Warp the game to a map, past its warp transition and dialogues.
+        """
+
+        number = self.model.story.level_number(os.path.basename(filename))
+        if number:
+            self.model.level_number = number
+        self.model.warp_level(restart=True, level_filename=filename)
+        # the map's dialogue queues its transitions as it is delivered
+        self.settle()
+        self.view.close_dialogue()
+        self.settle()
+        if self.view.transition or self.view.transition_queue:
+            raise RuntimeError(
+                'transitions still queued after loading %s' % (filename,))
+
+    def draw_frames(self, frames, tips=0, transition=False):
+        """
+        Render a number of frames, keeping the given number of floating
+        tips on screen, and a warp transition playing if transition is
+        True. Returns the timings as a dict.
+        """
+
+        view = self.view
+        view.message_sprites = []
+        self.phases.reset()
+        self.ui_phases.reset()
+        frame_times = []
+        for n in range(frames):
+            # tips we add this frame only count when they are drawn
+            while len(view.message_sprites) < tips:
+                view.create_floating_tip('floating tip %s' % (n,), color.tip)
+            if transition and not view.transition:
+                view.queue_warp_transitions()
+            start = time.time()
+            view.render()
+            frame_times.append(time.time() - start)
+
+        seconds = sum(frame_times)
+        frame_ms = numpy.array(frame_times) * 1000
+        phases = self.phases.as_dict()
+        phases['ui.update'] = self.ui_phases.as_dict()['update']
+        return {
+            'frames': frames,
+            'seconds': round(seconds, 3),
+            'frames_per_second': seconds and round(frames / seconds, 1) or 0,
+            'frame_ms': {
+                'p50': round(numpy.percentile(frame_ms, 50), 3),
+                'p95': round(numpy.percentile(frame_ms, 95), 3),
+                'p99': round(numpy.percentile(frame_ms, 99), 3),
+                'max': round(frame_ms.max(), 3),
+                },
+            'phases': phases,
+            }
+
+
+def run(frames=300, seed=1, story_name=benchmark.STORY_NAME,
+        fixtures=sorted(mapgen.FIXTURES)):
+    """
+    Draw idle frames, frames full of floating tips and frames of warp
+    transitions on every map of the story and the named mapgen fixtures.
+    Returns the results as a dict.
+    """
+
+    # switch to this path to point relative paths to resources
+    os.chdir(os.path.dirname(os.path.realpath(__file__)))
+    maps = sorted(glob.glob(os.path.join('stories', story_name, '*.tmx')))
+    results = {
+        'frames': frames,
+        'seed': seed,
+        'python': sys.version.split()[0],
+        'video_driver': os.environ['SDL_VIDEODRIVER'],
+        'levels': {},
+        }
+    # where we write the maps we make
+    map_path = tempfile.mkdtemp()
+    try:
+        for name in fixtures:
+            maps.append(mapgen.fixture(name,
+                            os.path.join(map_path, name + '.tmx'), seed))
+        bench = RenderBench(seed, story_name)
+        for filename in maps:
+            bench.load_map(filename)
+            results['levels'][os.path.basename(filename)] = {
+                'idle': bench.draw_frames(frames),
+                'tips': bench.draw_frames(frames, tips=TIP_COUNT),
+                'transition': bench.draw_frames(frames, transition=True),
+                }
+    finally:
+        shutil.rmtree(map_path)
+    return results
+
+
+if __name__ == '__main__':
+    frames = len(sys.argv) > 1 and int(sys.argv[1]) or 300
+    results_file = len(sys.argv) > 2 and sys.argv[2] or RESULTS_FILE
+    results_file = os.path.abspath(results_file)
+    trace.LEVEL = trace.WARNING
+    results = run(frames)
+    with open(results_file, 'wt') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    for name, level in sorted(results['levels'].items()):
+        for scenario, result in sorted(level.items()):
+            print('%-28s %-10s %8s fps  p50 %7s ms  p99 %7s ms' % (name,
+                scenario, result['frames_per_second'],
+                result['frame_ms']['p50'], result['frame_ms']['p99']))
+    print('wrote %s' % (results_file,))
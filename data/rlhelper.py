@@ -12,17 +12,23 @@
 #  along with this program. If not, see http://www.gnu.org/licenses/.
 
 import math
+import heapq
+import numpy
 
 
-def make_matrix(width, height, initial_value):
+def make_matrix(width, height, initial_value, dtype=numpy.uint8):
     """
-    Returns a list of initial values that can be accessed like a 2D array:
+    Returns a matrix of initial values that can be accessed like a 2D array:
 
-        matrix[x][y]
+        matrix[x][y] or matrix[x, y]
+
+    The matrix is a numpy array shaped (width, height), so it keeps working
+    with code written for the older list of lists, while whole-matrix passes
+    can be written as single array operations.
 
     """
 
-    return [[initial_value for y in range(0, height)] for x in range(0, width)]
+    return numpy.full((width, height), initial_value, dtype=dtype)
 
 
 def get_line_segments(x1, y1, x2, y2):
@@ -88,6 +94,84 @@ def line_of_sight(matrix, x1, y1, x2, y2):
     return amt == 0
 
 
+# octant transforms for field_of_view: (depth, column) -> (dx, dy) factors
+# given as (depth x, column x, depth y, column y) for each quadrant.
+FOV_QUADRANTS = (
+    (0, 1, -1, 0),  # north
+    (1, 0, 0, 1),   # east
+    (0, 1, 1, 0),   # south
+    (-1, 0, 0, 1),  # west
+    )
+
+
+def field_of_view(matrix, origin_x, origin_y, reach):
+    """
+    Returns a set of (x, y) positions visible from an origin within reach,
+    using symmetric shadowcasting over a blocking matrix.
+    This is a matrix created with make_matrix().
+
+    The origin is always visible, blocking tiles are visible when light
+    reaches them, and open tiles are visible only if the origin is in turn
+    visible from them. This makes vision symmetric: if you can see a
+    position it can see you.
+
+    Source: https://www.albertford.com/shadowcasting/
+
+    """
+
+    width, height = len(matrix), len(matrix[0])
+    visible = set([(origin_x, origin_y)])
+    max_depth = int(reach)
+    reach_squared = reach * reach
+    for quadrant in FOV_QUADRANTS:
+        _cast_light(matrix, width, height, origin_x, origin_y,
+                    max_depth, reach_squared, quadrant, visible,
+                    1, (-1, 1), (1, 1))
+    return visible
+
+
+def _cast_light(matrix, width, height, origin_x, origin_y,
+                max_depth, reach_squared, quadrant, visible,
+                depth, start_slope, end_slope):
+    """
+    Scan one row of a quadrant for field_of_view(), recursing into the
+    rows behind it.
+    Slopes are stored as (numerator, denominator) pairs to keep the
+    symmetry tests exact.
+
+    """
+
+    dxd, dxc, dyd, dyc = quadrant
+    while depth <= max_depth:
+        s_num, s_den = start_slope
+        e_num, e_den = end_slope
+        # round the start column ties up, and the end column ties down
+        min_col = (2 * depth * s_num + s_den) // (2 * s_den)
+        max_col = -((e_den - 2 * depth * e_num) // (2 * e_den))
+        prev_wall = None
+        for col in range(min_col, max_col + 1):
+            x = origin_x + depth * dxd + col * dxc
+            y = origin_y + depth * dyd + col * dyc
+            inside = x >= 0 and y >= 0 and x < width and y < height
+            # positions outside the map behave like unseen walls
+            wall = not inside or bool(matrix[x][y])
+            if inside and depth * depth + col * col <= reach_squared:
+                if wall or (col * s_den >= depth * s_num and
+                            col * e_den <= depth * e_num):
+                    visible.add((x, y))
+            if prev_wall and not wall:
+                start_slope = (2 * col - 1, 2 * depth)
+            if prev_wall is False and wall:
+                _cast_light(matrix, width, height, origin_x, origin_y,
+                            max_depth, reach_squared, quadrant, visible,
+                            depth + 1, start_slope, (2 * col - 1, 2 * depth))
+            prev_wall = wall
+        if prev_wall is not False:
+            # the row ended on a wall (or was empty): nothing more to see
+            return
+        depth += 1
+
+
 def remap_coords(rect, unit_width, unit_height):
     """
     An iterator that yields remapped values as (x, y) scaled to
@@ -165,4 +249,552 @@ def clamp(n, minn, maxn):
 
     """
 
-    return max(min(maxn, n), minn)
\ No newline at end of file
+    return max(min(maxn, n), minn)
+
+
+class ObjectGrid(object):
+    """
+    A spatial index of map objects keyed by the tiles they cover.
+
+    Objects are anything with x, y, width and height attributes measured
+    in tiles, so multi-tile objects are indexed on every tile they cover.
+    Queries return objects in the order they were added, which matches
+    the order of the level object list.
+
+    Call update() after an object moves or resizes to keep the index
+    current, and remove() once it leaves play.
+
+    """
+
+    def __init__(self):
+        # (x, y) -> [objects covering that tile]
+        self._cells = {}
+        # y -> set of x with objects on them, to skip empty rows and tiles
+        self._rows = {}
+        # object -> (left, top, right, bottom) tiles it is indexed on
+        self._footprints = {}
+        # object -> insertion sequence, used to order query results
+        self._order = {}
+        self._sequence = 0
+
+    def __contains__(self, obj):
+        return obj in self._footprints
+
+    def __len__(self):
+        return len(self._footprints)
+
+    def _footprint(self, obj):
+        """
+        Returns the (left, top, right, bottom) tile bounds of an object.
+        right and bottom are exclusive.
+
+        """
+
+        return (int(math.floor(obj.x)),
+                int(math.floor(obj.y)),
+                int(math.ceil(obj.x + obj.width)),
+                int(math.ceil(obj.y + obj.height)))
+
+    def _sorted(self, objects):
+        """
+        Returns the objects ordered by their insertion sequence.
+
+        """
+
+        if len(objects) > 1:
+            return sorted(objects, key=self._order.get)
+        return list(objects)
+
+    def add(self, obj):
+        """
+        Index an object on all the tiles it covers.
+
+        """
+
+        if obj in self._footprints:
+            self.update(obj)
+            return
+        self._order[obj] = self._sequence
+        self._sequence += 1
+        self._stamp(obj, self._footprint(obj))
+
+    def _stamp(self, obj, footprint):
+        """
+        Place an object on the cells of the given footprint.
+
+        """
+
+        left, top, right, bottom = footprint
+        for y in range(top, bottom):
+            row = self._rows.setdefault(y, set())
+            for x in range(left, right):
+                self._cells.setdefault((x, y), []).append(obj)
+                row.add(x)
+        self._footprints[obj] = footprint
+
+    def _unstamp(self, obj):
+        """
+        Clear an object from the cells it is indexed on.
+
+        """
+
+        left, top, right, bottom = self._footprints.pop(obj)
+        for y in range(top, bottom):
+            for x in range(left, right):
+                cell = self._cells[(x, y)]
+                cell.remove(obj)
+                if not cell:
+                    del self._cells[(x, y)]
+                    row = self._rows[y]
+                    row.discard(x)
+                    if not row:
+                        del self._rows[y]
+
+    def remove(self, obj):
+        """
+        Remove an object from the index.
+
+        """
+
+        if obj in self._footprints:
+            self._unstamp(obj)
+            del self._order[obj]
+
+    def update(self, obj):
+        """
+        Re-index an object after its position or size changed.
+
+        """
+
+        footprint = self._footprint(obj)
+        if self._footprints.get(obj) != footprint:
+            if obj in self._footprints:
+                self._unstamp(obj)
+            else:
+                self._order[obj] = self._sequence
+                self._sequence += 1
+            self._stamp(obj, footprint)
+
+    def at(self, x, y):
+        """
+        Returns a list of objects covering the tile at (x, y).
+
+        """
+
+        cell = self._cells.get((x, y))
+        if cell:
+            return self._sorted(cell)
+        return []
+
+    def _occupied(self, left, top, right, bottom):
+        """
+        Yields the (x, y) tiles that have objects on them within a region,
+        scanning rows from the top and each row from the left.
+        right and bottom are exclusive.
+        Only occupied rows and tiles are visited where there are fewer of
+        them than the region spans, so a query costs about the number of
+        objects it finds rather than the size of the region.
+
+        """
+
+        if bottom - top > len(self._rows):
+            rows = sorted(y for y in self._rows if top <= y < bottom)
+        else:
+            rows = [y for y in range(top, bottom) if y in self._rows]
+        for y in rows:
+            row = self._rows[y]
+            if right - left > len(row):
+                columns = sorted(x for x in row if left <= x < right)
+            else:
+                columns = [x for x in range(left, right) if x in row]
+            for x in columns:
+                yield (x, y)
+
+    def in_rect(self, x, y, width, height):
+        """
+        Returns a list of unique objects covering any tile in a region.
+
+        """
+
+        found = set()
+        for tile in self._occupied(x, y, x + width, y + height):
+            found.update(self._cells[tile])
+        return self._sorted(found)
+
+    def in_radius(self, x, y, reach, max_width, max_height):
+        """
+        Returns a list of unique objects covering any tile within reach
+        of (x, y), constrained to max boundaries like cover_area().
+        Objects are ordered by the first tile they are found on, scanning
+        rows from the top.
+
+        """
+
+        int_reach = int(round(reach))
+        found = []
+        seen = set()
+        for u, v in self._occupied(max(0, x - int_reach),
+                                   max(0, y - int_reach),
+                                   min(max_width, x + int_reach) + 1,
+                                   min(max_height, y + int_reach) + 1):
+            if distance(x, y, u, v) <= reach:
+                for obj in self._sorted(self._cells[(u, v)]):
+                    if obj not in seen:
+                        seen.add(obj)
+                        found.append(obj)
+        return found
+
+
+class Scheduler(object):
+    """
+    Holds items that come due after a number of steps, where a step is
+    whatever the owner counts: a frame, a turn.
+    Items are kept in a heap by due step, so scheduling and taking due
+    items costs O(log n), no matter how many are waiting.
+
+    """
+
+    def __init__(self):
+        """
+        Attributes:
+
+        now (int): the number of steps taken so far.
+        """
+
+        self.now = 0
+        # heap of [due, sequence, item, active, scheduler] entries
+        self._heap = []
+        self._sequence = 0
+        self._active = 0
+
+    def schedule(self, item, delay):
+        """
+        Schedule an item to come due after delay steps.
+        Items due on the same step come out in the order they went in.
+        Returns a handle to cancel() the item with.
+
+        """
+
+        self._sequence += 1
+        entry = [self.now + max(1, int(delay)), self._sequence, item,
+                True, self]
+        heapq.heappush(self._heap, entry)
+        self._active += 1
+        return entry
+
+    def cancel(self, handle):
+        """
+        Cancel a scheduled item. Cancelling it again, after it came due,
+        or on another scheduler, does nothing.
+
+        """
+
+        if handle[4] is self and handle[3]:
+            handle[3] = False
+            self._active -= 1
+
+    def advance(self, steps=1):
+        """
+        Take a number of steps.
+        Returns a list of the items that came due.
+
+        """
+
+        self.now += steps
+        due = []
+        while self._heap and self._heap[0][0] <= self.now:
+            entry = heapq.heappop(self._heap)
+            if entry[3]:
+                entry[3] = False
+                self._active -= 1
+                due.append(entry[2])
+        return due
+
+    def clear(self):
+        """
+        Cancel all scheduled items.
+
+        """
+
+        for entry in self._heap:
+            entry[3] = False
+        self._heap = []
+        self._active = 0
+
+    def __len__(self):
+        return self._active
+
+
+def next_action_turn(speed, turn):
+    """
+    Returns the first turn, from turn on, that a character of the given
+    speed acts on. Characters act on turns where int(turn % speed) == 0:
+    every turn for speeds up to 1, every speed turns for whole speeds.
+    Returns None if the character never acts.
+
+    """
+
+    if speed <= 0:
+        return None
+    # skip ahead to where the remainder wraps around below 1
+    offset = turn % speed
+    if offset >= 1:
+        turn += int(math.ceil(speed - offset))
+    # float rounding may leave us short
+    while int(turn % speed) != 0:
+        turn += 1
+    return turn
+
+
+class ActorSchedule(object):
+    """
+    Keeps the characters of a level in buckets keyed by the next turn
+    they act on, so that a turn only visits the characters acting on it.
+
+    Characters are anything with a speed attribute, see next_action_turn.
+    Call update() after a character's speed changes, and remove() once
+    it leaves play. Without an update() a new speed only takes effect on
+    the turn the character was due for, or on the next turn for one whose
+    speed of 0 or less had parked it. Characters come out in the order
+    they were added.
+
+    Characters can also sleep: they neither act nor iterate until they
+    are woken. Sleepers are indexed by the cell_size square of tiles they
+    sleep on, from their x and y attributes, to find those near a point.
+
+    """
+
+    # tiles per side of the cells sleeping characters are indexed by
+    cell_size = 8
+
+    def __init__(self):
+        # turn -> [characters acting on that turn]
+        self._buckets = {}
+        # heap of bucket turns, so a turn only looks at the buckets due.
+        # turns of buckets emptied since are left in and skipped.
+        self._turns = []
+        # character -> (turn, speed) it is bucketed with
+        self._due = {}
+        # awake characters that never act at their speed, rechecked
+        # every turn in case it rose without an update()
+        self._parked = set()
+        # character -> insertion sequence, used to order turn results
+        self._order = {}
+        self._sequence = 0
+        # awake character -> insertion sequence
+        self._awake = {}
+        # sleeping character -> (turn it fell asleep, cell)
+        self._sleeping = {}
+        # (cell x, cell y) -> [characters sleeping in that cell]
+        self._cells = {}
+
+    def __contains__(self, actor):
+        return actor in self._order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __iter__(self):
+        """
+        Iterate the awake characters in the order they were added, acting
+        on this turn or not.
+
+        """
+
+        return iter(sorted(self._awake, key=self._awake.get))
+
+    @property
+    def sleeping(self):
+        """
+        The number of sleeping characters.
+
+        """
+
+        return len(self._sleeping)
+
+    def add(self, actor, turn):
+        """
+        Add a character, acting from turn on.
+        Adding it again only updates it.
+
+        """
+
+        if actor not in self._order:
+            self._sequence += 1
+            self._order[actor] = self._sequence
+            self._awake[actor] = self._sequence
+        self.update(actor, turn)
+
+    def update(self, actor, turn):
+        """
+        Bucket a character by its current speed, acting from turn on.
+        Sleeping characters are bucketed when they wake.
+
+        """
+
+        if actor in self._sleeping:
+            return
+        self._unbucket(actor)
+        self._bucket(actor, next_action_turn(actor.speed, turn), actor.speed)
+
+    def remove(self, actor):
+        """
+        Remove a character. Removing it again does nothing.
+
+        """
+
+        if actor in self._order:
+            if self._unsleep(actor) is None:
+                self._unbucket(actor)
+                del self._awake[actor]
+            del self._order[actor]
+
+    def sleep(self, actor, turn):
+        """
+        Put a character to sleep on turn, until it is woken.
+
+        """
+
+        if actor in self._awake:
+            self._unbucket(actor)
+            del self._awake[actor]
+            cell = (int(actor.x) // self.cell_size,
+                    int(actor.y) // self.cell_size)
+            self._sleeping[actor] = (turn, cell)
+            self._cells.setdefault(cell, []).append(actor)
+
+    def wake(self, actor, turn):
+        """
+        Wake a sleeping character, acting from turn on.
+        Returns the number of turns it slept, or None if it was awake.
+
+        """
+
+        since = self._unsleep(actor)
+        if since is None:
+            return None
+        self._awake[actor] = self._order[actor]
+        self.update(actor, turn)
+        return turn - since
+
+    def _unsleep(self, actor):
+        """
+        Take a character out of the sleepers, without waking it.
+        Returns the turn it fell asleep, or None if it was awake.
+
+        """
+
+        asleep = self._sleeping.pop(actor, None)
+        if asleep is None:
+            return None
+        since, cell = asleep
+        self._cells[cell].remove(actor)
+        if not self._cells[cell]:
+            del self._cells[cell]
+        return since
+
+    def is_asleep(self, actor):
+        """
+        Returns True if the character is sleeping.
+
+        """
+
+        return actor in self._sleeping
+
+    def sleeping_near(self, x, y, reach):
+        """
+        Returns the sleeping characters in the cells within reach of
+        (x, y). Some may be a little further than reach.
+
+        """
+
+        size = self.cell_size
+        reach = int(math.ceil(reach))
+        found = []
+        for v in range((y - reach) // size, (y + reach) // size + 1):
+            for u in range((x - reach) // size, (x + reach) // size + 1):
+                found.extend(self._cells.get((u, v), ()))
+        return found
+
+    def _bucket(self, actor, due, speed):
+        if due is None:
+            self._parked.add(actor)
+            return
+        self._due[actor] = (due, speed)
+        bucket = self._buckets.get(due)
+        if bucket is None:
+            bucket = self._buckets[due] = []
+            heapq.heappush(self._turns, due)
+        bucket.append(actor)
+
+    def _unbucket(self, actor):
+        self._parked.discard(actor)
+        due = self._due.pop(actor, None)
+        if due:
+            self._buckets[due[0]].remove(actor)
+            if not self._buckets[due[0]]:
+                del self._buckets[due[0]]
+
+    def acting(self, turn):
+        """
+        Returns the characters acting on turn, and buckets them for the
+        turns after it. Characters due on earlier turns that were not
+        asked for act now. Characters whose speed changed without an
+        update() are rebucketed, and only act if they would on turn.
+
+        """
+
+        if self._parked:
+            for actor in [a for a in self._parked if a.speed > 0]:
+                self.update(actor, turn)
+        actors = []
+        turns = self._turns
+        while turns and turns[0] <= turn:
+            actors.extend(self._buckets.pop(heapq.heappop(turns), ()))
+        acting = []
+        for actor in actors:
+            due, speed = self._due.pop(actor)
+            if speed != actor.speed:
+                speed = actor.speed
+                if next_action_turn(speed, turn) != turn:
+                    self.update(actor, turn)
+                    continue
+            acting.append(actor)
+            self._bucket(actor, next_action_turn(speed, turn + 1), speed)
+        acting.sort(key=self._order.get)
+        return acting
+
+
+if __name__ == '__main__':
+
+    def test_actor_schedule():
+        class Actor(object):
+            def __init__(self, speed):
+                self.speed = speed
+
+        def acts(actor, turn):
+            return actor.speed > 0 and int(turn % actor.speed) == 0
+
+        speeds = [0, 0.5, 1, 2, 3, 4, 7]
+        actors = [Actor(speed) for speed in speeds]
+        schedule = ActorSchedule()
+        for actor in actors:
+            schedule.add(actor, 0)
+        for turn in range(200):
+            # stop and restart characters without an update(), and
+            # change speeds with one
+            if turn % 10 == 5:
+                for actor in actors[1::2]:
+                    actor.old_speed, actor.speed = actor.speed, 0
+            elif turn % 10 == 8:
+                for actor in actors[1::2]:
+                    actor.speed = actor.old_speed
+            elif turn % 50 == 0:
+                actors[-1].speed = speeds[turn / 50 % len(speeds)]
+                schedule.update(actors[-1], turn)
+            acting = schedule.acting(turn)
+            expected = [actor for actor in actors if acts(actor, turn)]
+            assert acting == expected, (turn, acting, expected)
+        print('the actor schedule acts characters on the turns they act')
+
+    test_actor_schedule()
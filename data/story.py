@@ -34,6 +34,19 @@ class StoryData(object):
         # store the path where the story conf lives
         self.path = os.path.dirname(config_path)
 
+        # lookups compiled from the conf by compile_blocking_tiles()
+        self.blocking_gids = frozenset()
+        self.blocking_table = bytearray()
+
+        self.prepare()
+
+    def prepare(self):
+        """
+        Tidy up the conf values and compile lookups from them.
+        Called on load and reload.
+
+        """
+
         # to format our config nicely we indent quoted paragraphs.
         # here we secretly strip these leading spaces.
         # do this for every screen in each dialogue.
@@ -48,6 +61,43 @@ class StoryData(object):
                                 in data[screen]['datas'].split('\n')])
                 data[screen]['datas'] = stripped
 
+        self.compile_blocking_tiles()
+
+    def reload(self):
+        """
+        Re-read the story conf from disk.
+        Any lookups compiled from it are rebuilt.
+
+        """
+
+        self.conf.reload()
+        self.prepare()
+
+    def compile_blocking_tiles(self):
+        """
+        Compile the blocking tiles section into quick lookups:
+
+            blocking_gids: a frozenset of blocking gids.
+            blocking_table: a bytearray indexed by gid, 1 where it blocks.
+
+        Call this again if the blocking tiles in the conf change.
+
+        """
+
+        gids = set()
+        blocks = self.conf['blocking tiles']
+        for key in blocks.keys():
+            for value in blocks.as_list(key):
+                try:
+                    gids.add(int(value))
+                except ValueError:
+                    pass
+        self.blocking_gids = frozenset(gids)
+        self.blocking_table = bytearray(max(gids | set([0])) + 1)
+        for gid in gids:
+            if gid >= 0:
+                self.blocking_table[gid] = 1
+
     def animations_by_gid(self, gid):
         """
         Return animation settings for a GID.
@@ -182,7 +232,4 @@ class StoryData(object):
 
         """
 
-        blocks = self.conf['blocking tiles']
-        for key in blocks.keys():
-            if str(gid) in blocks.as_list(key):
-                return True
+        return gid in self.blocking_gids
@@ -12,7 +12,12 @@
 #  along with this program. If not, see http://www.gnu.org/licenses/.
 
 import os
-import pygame   # used in TilesetParser only
+import numpy
+try:
+    import pygame   # used in TilesetParser only
+except ImportError:
+    # the game model runs headless without pygame
+    pygame = None
 import struct
 from xml.etree import ElementTree
 
@@ -98,6 +103,16 @@ class TMXParser(ObjectHelper):
 
         return (self.tile_width * multiplier, self.tile_height * multiplier)
 
+    def tile_gids(self):
+        """
+        Return the gids of all tile layers as one contiguous numpy array,
+        indexed as [layer, y, x].
+        """
+
+        if not self.tilelayers:
+            return numpy.zeros((0, self.height, self.width), dtype=numpy.int32)
+        return numpy.array([layer.array for layer in self.tilelayers])
+
 
 class Tileset(ObjectHelper):
     """
@@ -119,6 +134,9 @@ class Tilelayer(ObjectHelper):
     """
     Stores tmx map layer data.
 
+    data is a tuple of gids stored row by row, and array is the same
+    gids as a numpy array indexed as [y, x].
+
     """
 
     def __init__(self, tag):
@@ -131,6 +149,8 @@ class Tilelayer(ObjectHelper):
         self.compression = data.attrib['compression']
         data = data.text.strip()
         data = data.decode('base64').decode('zlib')
+        self.array = numpy.frombuffer(data, dtype='<i4').reshape(
+                                            (self.height, self.width))
         data = struct.unpack('<%di' % (len(data) / 4,), data)
         self.data = data
         assert len(data) == self.width * self.height
@@ -256,26 +276,30 @@ class TilesetParser(dict):
         colorkey((r, g, b)) of the transparency key. no alpha here.
         """
 
-        self._tiles = {}
+        # tile images indexed by gid. gid 0 is the empty tile.
+        self._tiles = [None]
         image = pygame.image.load(filename).convert()
         image.set_colorkey(colorkey)
         w, h = image.get_size()
         w, h = (w / tilesize[0], h / tilesize[1])
 
+        # gids count from left to right, top to bottom: x + (y * w) + 1
         for y in range(0, h):
             for x in range(0, w):
-                gid = x + (y * w) + 1
-                self._tiles[gid] = image.subsurface(
+                self._tiles.append(image.subsurface(
                                     pygame.Rect(
                                             (x * tilesize[0], y * tilesize[1]),
-                                            tilesize))
+                                            tilesize)))
 
     def __getitem__(self, gid):
         """
         Get a tile image by graphic index.
+        Returns None for gid 0 or gids outside the tileset.
         """
 
-        if gid in self._tiles.keys():
+        # map triggers can alter gids into floats
+        gid = int(gid)
+        if 0 < gid < len(self._tiles):
             return self._tiles[gid]
 
     def __len__(self):
@@ -283,7 +307,64 @@ class TilesetParser(dict):
         Return the number of image tiles.
         """
 
-        return len(self._tiles)
+        return len(self._tiles) - 1
+
+    def tiles(self, gids):
+        """
+        Get a list of tile images for a sequence of graphic indexes.
+        Gids without an image give None in their place.
+        """
+
+        tiles = self._tiles
+        count = len(tiles)
+        return [tiles[gid] if 0 < gid < count else None for gid in gids]
+
+
+class TilesetCache(object):
+    """
+    Keeps parsed tilesets in memory so they load from disk only once.
+    Tilesets are keyed by (path, tile size, colorkey). Call invalidate()
+    after an image is edited to have it parsed again.
+    """
+
+    def __init__(self):
+        self._tilesets = {}
+
+    def get(self, filename, tilesize, colorkey):
+        """
+        Get the TilesetParser for an image, parsing it if not cached yet.
+        Arguments are the same as for TilesetParser.
+        """
+
+        key = (os.path.abspath(filename), tuple(tilesize), tuple(colorkey))
+        tileset = self._tilesets.get(key, None)
+        if tileset is None:
+            tileset = TilesetParser(filename, tilesize, colorkey)
+            self._tilesets[key] = tileset
+        return tileset
+
+    def invalidate(self, filename):
+        """
+        Forget the cached tilesets of an image.
+        """
+
+        path = os.path.abspath(filename)
+        for key in [k for k in self._tilesets if k[0] == path]:
+            del self._tilesets[key]
+
+    def clear(self):
+        """
+        Forget all cached tilesets.
+        """
+
+        self._tilesets = {}
+
+    def __len__(self):
+        """
+        Return the number of cached tilesets.
+        """
+
+        return len(self._tilesets)
 
 
 if __name__ == '__main__':
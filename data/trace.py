@@ -11,37 +11,180 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program. If not, see http://www.gnu.org/licenses/.
 
+import time
+from collections import deque
+
+# trace levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+# print traces to stdout
 TRACE = True
 
+# the lowest level printed to stdout
+LEVEL = INFO
+
+# only print traces of these categories to stdout, None prints all
+CATEGORIES = None
+
+# the number of recent traces kept in memory for crash logs.
+# 0 disables keeping them.
+RING_SIZE = 200
+
+# the lowest level kept in memory for crash logs
+RING_LEVEL = INFO
+
+# recent traces as (time, level, category, formatted text) tuples
+_ring = deque(maxlen=RING_SIZE)
+
+
+def enabled(level, category):
+    """
+    Test if a trace of this level and category is printed or kept.
+    Lets callers skip building expensive trace arguments.
+    """
+
+    if RING_SIZE and level >= RING_LEVEL:
+        return True
+    return TRACE and level >= LEVEL and (
+        CATEGORIES is None or category in CATEGORIES)
+
+
+def format_trace(text, args):
+    """
+    Returns the trace text formatted with its args.
+    """
+
+    if type(text) is list:
+        text = str.join('* ', text)
+    if args:
+        text = text % args
+    return text
+
+
+def safe_format(text, args):
+    """
+    Returns the trace text formatted with its args, or both as they are
+    if they do not format.
+    """
+
+    try:
+        return format_trace(text, args)
+    except Exception:
+        return '%r %% %r' % (text, args)
+
+
+def record(level, category, text, args):
+    """
+    Keeps a trace in memory and prints it if the level and category allow.
+    Kept traces are formatted as they are recorded, so they show the
+    args as they were then and hold no references to them.
+    Traces that are neither kept nor printed cost little more than a
+    function call.
+    """
+
+    formatted = None
+    if RING_SIZE and level >= RING_LEVEL:
+        if _ring.maxlen != RING_SIZE:
+            resize_ring()
+        formatted = safe_format(text, args)
+        _ring.append((time.time(), level, category, formatted))
+    if TRACE and level >= LEVEL:
+        if CATEGORIES is None or category in CATEGORIES:
+            if formatted is None:
+                formatted = format_trace(text, args)
+            if len(formatted) > 0:
+                print('* %s' % (formatted, ))
+
+
+def debug(category, text, *args):
+    """
+    Trace details that are only interesting while debugging.
+    text is formatted with args, if any, when printed.
+    """
+
+    record(DEBUG, category, text, args)
+
+
+def info(category, text, *args):
+    """
+    Trace what the game is doing.
+    """
+
+    record(INFO, category, text, args)
+
+
+def warning(category, text, *args):
+    """
+    Trace something that went not quite as expected.
+    """
+
+    record(WARNING, category, text, args)
+
 
 def write(text):
     """
     Writes a message to stdout.
     """
-    if TRACE:
-        if type(text) is list:
-            text = str.join('* ', text)
-        if len(text) > 0:
-            print('* %s' % (text, ))
+
+    record(INFO, 'general', text, None)
 
 
 def error(text):
     """
     Writes error output.
     """
+    if RING_SIZE:
+        _ring.append((time.time(), ERROR, 'general', str(text)))
     if type(text) is str:
         print('\n# ERR: ' + text)
     else:
         print(text)
 
 
+def resize_ring():
+    """
+    Apply a changed RING_SIZE, keeping the most recent traces.
+    """
+
+    global _ring
+    _ring = deque(_ring, maxlen=RING_SIZE)
+
+
+def recent():
+    """
+    Returns a list of formatted recent traces, oldest first.
+    """
+
+    lines = []
+    for when, level, category, text in list(_ring):
+        lines.append('%s %-7s %-8s %s' % (
+            time.strftime('%H:%M:%S', time.localtime(when)),
+            LEVEL_NAMES.get(level, level), category, text))
+    return lines
+
+
 def log_crash(error_message):
     """
-    Log the crash to text file.
+    Log the crash and the most recent traces to text file.
     """
 
     import datetime
     log = open('error.log', 'wt')
     log.write('ALIVE CRASH LOG - ' + datetime.datetime.now().strftime('%c'))
     log.write('\n' + str(error_message))
+    traces = recent()
+    if traces:
+        log.write('\nRECENT TRACES:\n')
+        log.write('\n'.join(traces) + '\n')
     log.close()
+
+
+LEVEL_NAMES = {
+    DEBUG: 'DEBUG',
+    INFO: 'INFO',
+    WARNING: 'WARNING',
+    ERROR: 'ERROR',
+    }
@@ -207,6 +207,18 @@ class UxMovingButton(UxButton):
         if self.destinations.has_key(key):
             self.destination = self.destinations[key]
 
+    @property
+    def is_moving(self):
+        """
+        Test if the next update() will step us towards our destination.
+
+        """
+
+        if self.destination:
+            x_diff = self.destination.left - self.rect.left
+            y_diff = self.destination.top - self.rect.top
+            return int(x_diff / 10) != 0 or int(y_diff / 10) != 0
+
     def update(self, manager_context):
         """
         Step the button position towards destination.
@@ -313,6 +325,10 @@ class UxManager(object):
         self.context = None
         self.elements = []
         self.context_elements = []
+        # screen areas that changed on the last update()
+        self.dirty_rects = []
+        # how each element looked on the last update(), by element id
+        self._drawn = {}
         self.image = pygame.Surface(size)
         self.image.set_colorkey(colorkey)
         self.source = pygame.image.load(image_filename)
@@ -447,17 +463,44 @@ class UxManager(object):
                     tab.isclicked = False
                     tab.draw(self.source, self.image)
 
+    @property
+    def is_animating(self):
+        """
+        Test if any of our elements are moving.
+
+        """
+
+        for ux in self.elements:
+            if type(ux) is UxMovingButton and ux.is_moving:
+                return True
+        return False
+
     def update(self):
         """
         Tell all our elements to go draw themselves.
         """
 
         self.image.fill(self.colorkey)
+        drawn = {}
+        self.dirty_rects = []
         for ux in self.elements:
             if type(ux) is UxMovingButton:
                 ux.update(self.context)
             if ux.visible:
                 ux.draw(self.source, self.image)
+                # remember how it looks to find which areas changed
+                look = (tuple(ux.rect), tuple(ux.calculated_rect()),
+                    ux.enabled, ux.border_color, ux.hotkey_image)
+                drawn[id(ux)] = (ux.rect.copy(), look)
+                last = self._drawn.pop(id(ux), None)
+                if not last:
+                    self.dirty_rects.append(ux.rect.copy())
+                elif last[1] != look:
+                    self.dirty_rects.append(last[0].union(ux.rect))
+        # elements no longer drawn leave their last area dirty
+        for rect, look in self._drawn.values():
+            self.dirty_rects.append(rect)
+        self._drawn = drawn
 
     def alter_hue(self, hue, surface_to_clone):
         """ This cleverness rotates the pixel rgb values through